@@ -3,11 +3,25 @@
 # title: Colors and Shapes (placeholder title)
 # description: a platformer about changing colors and shapes to solve puzzles
 
+from time import monotonic, perf_counter # for calculating delta time
+_start = perf_counter() # for profiling startup
+
 import pygame as pg, sys
-from time import monotonic # for calculating delta time
 from script.settings import *
 from script.player import Player
 from script.level import Level
+from script.controls import Controls
+from script.hot_reload import LevelWatcher
+from script.telemetry import Telemetry, LEVEL_LOAD, LEVEL_CHANGE, SOUND_DECODE, IMAGE_DECODE, RECOLOR
+from script.resources import ResourceCache, surface_size, sound_size
+from script.utilities import replace_pixels
+from script.render import DirtyRenderer, RenderThread
+from script.animation import AnimationService
+from script.capture import FrameCapture
+from script.warmup import Warmup
+from script.debug import STARTUP
+STARTUP.start = _start
+STARTUP.add('imports', perf_counter() -_start)
 
 class Game():
     def __init__(self):
@@ -16,29 +30,54 @@ class Game():
         self.prev_time = monotonic() # for calculating delta time
 
         # set up display
-        display_info = pg.display.Info()
-        display_size = (display_info.current_w, round(display_info.current_w *RES[1]/RES[0])) # match display aspect ratio to game aspect ratio
-        self.screen =  pg.display.set_mode(display_size, flags=pg.SCALED, vsync=1)
-        pg.display.set_caption('Colors and Shapes')     
-        if FULLSCREEN: pg.display.toggle_fullscreen()
+        with STARTUP.section('display init'):
+            display_info = pg.display.Info()
+            display_size = (display_info.current_w, round(display_info.current_w *RES[1]/RES[0])) # match display aspect ratio to game aspect ratio
+            self.screen =  pg.display.set_mode(display_size, flags=pg.SCALED, vsync=int(VSYNC))
+            pg.display.set_caption('Colors and Shapes')     
+            if FULLSCREEN: pg.display.toggle_fullscreen()
+
+            # show a blank frame right away while the start level loads
+            self.screen.fill(C_BACKGROUND)
+            pg.display.update()
+
+        self.controls = Controls()
+        self.telemetry = Telemetry(TELEMETRY_FRAMES) # per-frame records. see telemetry.py
+        self.warmup = Warmup(self) # traces first uses of assets and preloads them next time. see warmup.py
+        if WARMUP: self.warmup.load_manifest()
 
         # set up game surface (scaled to display size)
         self.game_surface = pg.Surface(RES)   
+        self.dirty_renderer = DirtyRenderer()
+        self.capture = FrameCapture(RES) # see capture.py
+        if CAPTURE: self.capture.start()
+        if PIPELINED_RENDERING: self.render_thread = RenderThread(self.screen.get_size(), self.capture)
         
-        self.images = {} # maps .png filenames to pygame.Surface objects
-        self.sounds = {} # maps .mp3 filenames to pygame.Sound objects
+        # resource caches with memory budgets. see resources.py
+        self.images = ResourceCache('images', IMAGE_BUDGET, surface_size, get_parent=lambda surface: surface.get_parent()) # maps .png filenames to pygame.Surface objects. animation frames keep their spritesheet cached
+        self.sounds = ResourceCache('sounds', SOUND_BUDGET, sound_size, is_busy=lambda sound: sound.get_num_channels() > 0) # maps .mp3 filenames to pygame.Sound objects
+        self.animations = AnimationService() # shared animation clocks. see animation.py
+        self.levels = ResourceCache('levels', LEVEL_BUDGET, lambda level: level.get_size(), 
+                                    is_busy=self.level_in_use, on_evict=lambda name, level: level.release()) # maps .tmx filenames to Level objects
+        self.level_states = {} # maps names of evicted levels to the state of their objects (see Level.save_state)
         
         # load level
+        self.camera_offset = (0, 0) # set once the player has spawned
         self.active_checkpoint = None # set when start Level is initialized
         self.level = Level(self, START_LEVEL)
-        self.levels = {self.level.name: self.level} # maps .tmx filenames to Level objects
+        self.levels[self.level.name] = self.level
+        self.levels.pin(self.level.name) # active level is never evicted
+        self.level_watcher = LevelWatcher(self)
 
         # create player 
-        self.player = Player(self.level, self.level.name)
-        self.player.respawn(self.active_checkpoint)
+        with STARTUP.section('player build'):
+            self.player = Player(self.level, self.level.name)
+            self.player.respawn(self.active_checkpoint)
 
         # position game camera
         self.camera_offset = (self.player.rect.centerx -self.game_surface.get_width()//2, self.player.rect.centery -self.game_surface.get_height()//2)     
+        self.prev_time = monotonic() # don't count loading time towards the first frame's delta time
+        if WARMUP: self.warmup.start_recording()
 
     def load_level(self, filename):
         ''' creates and a new Level object.
@@ -52,31 +91,68 @@ class Game():
             sprite.end_animation() 
             sprite.animate(0)
         self.level.particles.empty() # remove particles 
+        self.levels.resize(self.level.name) # objects may have been streamed in or out
+        self.levels.unpin(self.level.name)
         
         ### load new level
+        self.telemetry.event(LEVEL_CHANGE)
         if filename not in self.levels.keys():
-            self.levels[filename] = Level(self, filename) # load new level for the first time
+            self.telemetry.event(LEVEL_LOAD)
+            with self.warmup.load('level', filename): self.levels[filename] = Level(self, filename) # load new level for the first time
+        else: self.warmup.touch('level', filename)
         self.level = self.levels[filename] # load previously loaded level
+        self.levels.pin(filename)
         self.player.level = self.level # update player's level attribute
 
         for sprite in self.level.inactive: sprite.reset() # reset inactive objects
-        for key in self.player.keys: self.level.decorative_objs.add(key) # add collected keys to decorative group. only reset keys when respawning
+        for key in self.player.keys: # add collected keys to decorative group. only reset keys when respawning
+            self.level.decorative_objs.add(key)
+            self.level.scheduler.register(key)
+        if self.level.chunks: 
+            self.level.chunks.reset() # reset unloaded inactive objects
+            self.level.chunks.update() # load chunks around the player before they move in the new level
         
+    def level_in_use(self, level):
+        ''' levels that can't be evicted from self.levels (active level, or a level that the player is carrying keys from) '''
+        return level is self.level or any(key.level is level for key in self.player.keys)
+
+    def memory_report(self):
+        ''' returns a summary of memory used by images, sounds, and levels '''
+        caches = (self.images, self.sounds, self.levels)
+        return '\n'.join([cache.report() for cache in caches] +[f'total: {sum(cache.size for cache in caches)/2**20:.1f} MB'])
+
     def run(self):
         while True:
-            self.check_events() # clears event queue each frame prevents crashes
             delta_time = self.update_time() # update clock and get delta time
-            self.level.run(delta_time) # update and draw current level
-
-    def check_events(self):
-        ''' checks if game has been stopped and 
-        clears event queue each frame prevents crashes '''
-        for event in pg.event.get(): # clearing event queue each frame prevents crashes
-            if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE):
-                pg.quit()
-                sys.exit()
-            elif event.type == pg.KEYDOWN and event.key == K_RESET:
-                self.player.kill()
+            inputs = self.controls.sample() # sample input after waiting on the clock so it's as fresh as possible
+            self.check_events(inputs)
+            if HOT_RELOAD: self.level_watcher.update(delta_time)
+            self.level.run(delta_time, inputs) # update and draw current level
+            if WARMUP: self.warmup.update(self.prev_time +1/FPS -monotonic()) # preload assets in the time left before the next frame
+            if STARTUP.enabled: STARTUP.report() # first frame is on the screen
+
+    def check_events(self, inputs):
+        ''' checks if game has been stopped or reset '''
+        if inputs.quit:
+            if TELEMETRY: self.telemetry.save()
+            self.capture.stop()
+            if WARMUP: self.warmup.save()
+            if DEBUG and WARMUP: print(self.warmup.report())
+            if DEBUG: print(self.memory_report())
+            pg.quit()
+            sys.exit()
+        elif 'reset' in inputs.pressed:
+            self.controls.consume('reset')
+            self.player.kill()
+        elif 'save_telemetry' in inputs.pressed:
+            self.controls.consume('save_telemetry')
+            self.telemetry.save()
+        elif 'memory_report' in inputs.pressed:
+            self.controls.consume('memory_report')
+            print(self.memory_report())
+        elif 'capture' in inputs.pressed:
+            self.controls.consume('capture')
+            self.capture.toggle()
 
     def update_time(self):
         self.clock.tick(FPS) # cap framerate at FPS
@@ -95,18 +171,47 @@ class Game():
         )
 
     def load_image(self, filename):
-        try: return self.images[filename]
+        try: image = self.images[filename]
         except: 
-            self.images[filename] = pg.image.load(f'img/{filename}.png').convert_alpha()
+            self.telemetry.event(IMAGE_DECODE)
+            with STARTUP.section('asset decode'), self.warmup.load('image', filename):
+                self.images[filename] = pg.image.load(f'img/{filename}.png').convert_alpha()
             return self.images[filename]
+        self.warmup.touch('image', filename)
+        return image
+        
+    def load_colored_image(self, filename, color='white', rgb_shift=0):
+        ''' get an image with its white pixels (C_WHITE) replaced by a color.
+        recolored images are saved in self.images like other images.
+        rgb_shift: value by which to change RGB values of the color (for lighter or darker colors) '''
+        if color == 'white': return self.load_image(filename) # default color
         
+        colored_name = f'{filename}-{color}' +(f'{rgb_shift:+d}' if rgb_shift else '')
+        try: 
+            image = self.images[colored_name]
+            self.warmup.touch('recolor', filename, color, rgb_shift)
+            return image
+        except KeyError: # create colored image if it doesn't exist yet
+            with self.warmup.load('recolor', filename, color, rgb_shift):
+                # get RGB tuple from color string
+                if color == 'orange': rgb_shift = int(rgb_shift*ORANGE_SHIFT_COEF)
+                rgb = tuple(min(255, max(0, rgb+rgb_shift)) for rgb in COLORS[color]) # shift color brighter or darker
+
+                image = self.load_image(filename)
+                self.telemetry.event(RECOLOR)
+                with STARTUP.section('recolor'): self.images[colored_name] = replace_pixels(image, rgb, C_WHITE)
+            return self.images[colored_name]
+
     def play_sound(self, filename):
         if SOUND:
-            try: self.sounds[filename].play()
+            try: 
+                self.sounds[filename].play()
+                self.warmup.touch('sound', filename)
             except: 
-                self.sounds[filename] = pg.mixer.Sound(f'sound/{filename}.mp3')
+                self.telemetry.event(SOUND_DECODE)
+                with self.warmup.load('sound', filename): self.sounds[filename] = pg.mixer.Sound(f'sound/{filename}.mp3')
                 self.sounds[filename].play()
 
 if __name__ == '__main__':
-    pg.init() # initialize pygame
+    with STARTUP.section('display init'): pg.init() # initialize pygame
     Game().run() # create and run a new Game 
\ No newline at end of file
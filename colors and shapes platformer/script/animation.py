@@ -0,0 +1,32 @@
+from weakref import WeakValueDictionary, WeakSet
+
+class AnimationClock():
+    ''' timeline shared by every sprite playing the same animation (same spritesheet, state, and color).
+    a negative animation speed means the animation starts at the last frame '''
+    def __init__(self, animation_speed, frames):
+        self.animation_speed = animation_speed
+        self.frames = frames # list of images
+        self.frame = len(frames) -.01 if animation_speed < 0 else 0
+        self.image = frames[int(self.frame)]
+
+    def tick(self, dt):
+        self.frame = (self.frame +self.animation_speed*dt) % len(self.frames) # loop animation
+        self.image = self.frames[int(self.frame)]
+
+class AnimationService():
+    ''' keeps one AnimationClock for each (spritesheet, state, color) and advances each clock once per frame.
+    sprites with shared animations only hold a reference to a clock (see AnimatedSprite).
+    clocks are dropped once no sprite uses them, so their frames can be evicted from Game.images '''
+    def __init__(self):
+        self.clocks = WeakValueDictionary() # maps (spritesheet name, state, color) to AnimationClocks
+        self.playing = WeakSet() # clocks with more than one frame and a nonzero animation speed
+
+    def get_clock(self, key, animation_speed, frames):
+        clock = self.clocks.get(key)
+        if clock == None:
+            clock = self.clocks[key] = AnimationClock(animation_speed, frames)
+            if animation_speed and len(frames) > 1: self.playing.add(clock)
+        return clock
+
+    def update(self, dt):
+        for clock in self.playing: clock.tick(dt)
@@ -0,0 +1,133 @@
+''' benchmarks. run from the game's folder:
+    python -m script.benchmark render [--frames 600] [--level white]
+        frame throughput of the serial game loop vs. pipelined rendering (see render.py)
+    python -m script.benchmark load
+        time to load each level
+    python -m script.benchmark update [--frames 600]
+        time to update the start level, without drawing
+    python -m script.benchmark memory
+        memory used by each level with platforms and spikes stored as sprites vs. in arrays (see static.py)
+all benchmarks take --world <folder> to use generated stress levels (see generate_level.py)
+runs headless (no window or sound) unless SDL_VIDEODRIVER is set '''
+import argparse, os, sys
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame as pg
+from time import perf_counter
+from script.settings import *
+from script.controls import InputSnapshot
+
+def configure(**settings):
+    ''' override settings in every module of the game (modules import settings with *) '''
+    for name, module in list(sys.modules.items()):
+        if name != 'main' and not name.startswith('script'): continue
+        for setting, value in settings.items():
+            if hasattr(module, setting): setattr(module, setting, value)
+
+def new_game(level, **settings):
+    ''' create a Game with benchmark settings (no debug overlay, sound, telemetry, etc.). settings override them '''
+    import main
+    configure(**{**dict(START_LEVEL=level, DEBUG=False, SOUND=False, PROFILE_STARTUP=False, TELEMETRY=False, HOT_RELOAD=False, VSYNC=False, WARMUP=False), **settings})
+    pg.display.quit() # each game sets up a new display
+    pg.display.init()
+    return main.Game()
+
+def play(game, frames):
+    ''' runs the game loop for a number of frames with a fixed delta time. 
+    the player runs back and forth so the camera scrolls. returns elapsed time (in seconds) '''
+    start = perf_counter()
+    for frame in range(frames):
+        direction = 'right' if frame//FPS % 2 == 0 else 'left'
+        game.level.run(1/FPS, InputSnapshot(perf_counter(), False, frozenset((direction,)), frozenset()))
+    return perf_counter() -start
+
+def bench_render(args):
+    print(f'{os.cpu_count()} cpus, {args.frames} frames of \'{args.level}\'')
+    results = {}
+    for mode in ('serial', 'pipelined'):
+        game = new_game(args.level, PIPELINED_RENDERING=mode == 'pipelined')
+        play(game, FPS) # warm up caches
+        elapsed = play(game, args.frames)
+        if mode == 'pipelined': 
+            start = perf_counter()
+            game.render_thread.flush(game.screen)
+            elapsed += perf_counter() -start
+        results[mode] = args.frames/elapsed
+        print(f'{mode:>10}: {results[mode]:8.1f} frames/s ({elapsed/args.frames*1000:.2f} ms/frame)')
+    print(f'{"speedup":>10}: {results["pipelined"]/results["serial"]:8.2f}x')
+
+def bench_load(args):
+    from script.level import Level
+    game = new_game(args.level)
+    for filename in sorted(os.listdir('level')):
+        if not filename.endswith('.tmx'): continue
+        name = filename[:-4]
+        active_checkpoint = game.active_checkpoint # creating a level can change the active checkpoint
+        start = perf_counter()
+        level = Level(game, name)
+        elapsed = perf_counter() -start
+        game.active_checkpoint = active_checkpoint
+        print(f'{name:>10}: {elapsed*1000:8.1f} ms, {len(level.records)} objects in file, {len(level.objects) +len(level.statics or ())} loaded')
+
+def bench_update(args):
+    game = new_game(args.level)
+    game.level.update(1/FPS, InputSnapshot(0, False, frozenset(), frozenset())) # warm up
+    start = perf_counter()
+    for frame in range(args.frames):
+        direction = 'right' if frame//FPS % 2 == 0 else 'left'
+        game.level.update(1/FPS, InputSnapshot(perf_counter(), False, frozenset((direction,)), frozenset()))
+    elapsed = perf_counter() -start
+    print(f'{len(game.level.records)} objects in \'{args.level}\', {len(game.level.objects) +len(game.level.statics or ())} loaded')
+    print(f'update: {elapsed/args.frames*1000:.3f} ms/frame')
+
+def bench_memory(args):
+    import gc, tracemalloc
+    from script.level import Level
+    names = sorted(filename[:-4] for filename in os.listdir('level') if filename.endswith('.tmx'))
+    results = {}
+    for static_arrays in (False, True):
+        game = new_game(args.level, STATIC_ARRAYS=static_arrays)
+        active_checkpoint = game.active_checkpoint # creating a level can change the active checkpoint
+        for name in names: Level(game, name) # load and recolor images first so they aren't counted
+        for name in names:
+            gc.collect()
+            tracemalloc.start()
+            level = Level(game, name)
+            gc.collect() # don't count garbage left by parsing the tmx file
+            python_size = tracemalloc.get_traced_memory()[0] # python objects
+            tracemalloc.stop()
+            results[name, static_arrays] = (python_size, level.get_size(), len(level.records))
+            del level
+        game.active_checkpoint = active_checkpoint
+
+    print(f'{"":>10}{"objects":>9}{"sprites":>12}{"arrays":>12}{"change":>9}   (python objects / level estimate incl. images, in KB)')
+    for name in names:
+        before, after, n = *(results[name, static_arrays][:2] for static_arrays in (False, True)), results[name, True][2]
+        for i, label in enumerate(('python', 'estimate')):
+            print(f'{name if not i else "":>10}{n if not i else "":>9}{before[i]/1024:12.1f}{after[i]/1024:12.1f}{(after[i] -before[i])/max(before[i], 1):+9.0%} {label}')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='game benchmarks')
+    parser.add_argument('--world', help='folder with generated levels (see generate_level.py)')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    render = subparsers.add_parser('render', help='serial vs. pipelined rendering frame throughput')
+    render.add_argument('--frames', type=int, default=FPS*10)
+    render.set_defaults(run=bench_render)
+
+    load = subparsers.add_parser('load', help='time to load each level')
+    load.set_defaults(run=bench_load)
+
+    update = subparsers.add_parser('update', help='time to update the start level')
+    update.add_argument('--frames', type=int, default=FPS*10)
+    update.set_defaults(run=bench_update)
+
+    memory = subparsers.add_parser('memory', help='memory used by each level with and without STATIC_ARRAYS')
+    memory.set_defaults(run=bench_memory)
+
+    for subparser in (render, load, update, memory): subparser.add_argument('--level', default=START_LEVEL, help='start level')
+    args = parser.parse_args()
+    if args.world: os.chdir(args.world) # levels, images, and sounds are loaded relative to the working directory
+    pg.init()
+    args.run(args)
@@ -0,0 +1,89 @@
+''' built-in frame capture (for bug reports and trailers) that doesn't change the game's frame timing.
+toggle with K_CAPTURE (see settings.py). each recording is saved to captures/<date>_<time>/:
+    png format: one numbered png per frame
+    raw format: frames.rgb with every frame as 24-bit RGB. convert to a video with the ffmpeg command printed when recording stops
+    times.txt: when each frame was captured (in seconds since the recording started), for measuring frame timing
+frames are copied to a ring of preallocated buffers and written to disk on a separate thread.
+when the writer can't keep up, frames are dropped (and counted) instead of making the game wait.
+capture can be called from the render thread (see RenderThread), so starting, stopping, and capturing hold a lock '''
+import os
+from array import array
+from collections import deque
+from queue import Queue
+from threading import Thread, Lock
+from time import perf_counter, strftime
+import pygame as pg
+from script.settings import *
+
+class FrameCapture():
+    def __init__(self, size, format=CAPTURE_FORMAT, buffers=CAPTURE_BUFFERS):
+        self.size = size
+        self.format = format
+        self.n_buffers = buffers
+        self.recording = False
+        self.buffers = [] # preallocated when recording starts
+        self.thread = None
+        self.lock = Lock() # held while capturing a frame or starting or stopping a recording
+
+    def start(self):
+        ''' allocate frame buffers and start the writer thread '''
+        if self.recording: return
+        self.folder = f'captures/{strftime("%Y-%m-%d_%H-%M-%S")}'
+        os.makedirs(self.folder, exist_ok=True)
+
+        with self.lock:
+            if len(self.buffers) != self.n_buffers: self.buffers = [pg.Surface(self.size) for _ in range(self.n_buffers)]
+            self.buffer_times = array('d', bytes(8*self.n_buffers)) # when the frame in each buffer was captured
+            self.free = deque(range(self.n_buffers)) # indices of buffers that can be copied to
+            self.filled = Queue() # indices of buffers waiting to be written. None stops the writer
+
+            self.start_time = perf_counter()
+            self.captured, self.dropped = 0, 0
+            self.recording = True
+        self.thread = Thread(target=self.write, daemon=True)
+        self.thread.start()
+        print(f'capturing frames to {self.folder}')
+
+    def stop(self):
+        ''' wait for the writer to finish the remaining frames '''
+        if not self.recording: return
+        with self.lock: # no frame can be queued after the writer is told to stop
+            self.recording = False
+            self.filled.put(None)
+        self.thread.join()
+        print(f'captured {self.captured} frames to {self.folder} ({self.dropped} dropped)')
+        if self.format == 'raw':
+            print(f'    ffmpeg -f rawvideo -pixel_format rgb24 -video_size {self.size[0]}x{self.size[1]} -framerate {FPS} -i {self.folder}/frames.rgb {self.folder}.mp4')
+
+    def toggle(self):
+        if self.recording: self.stop()
+        else: self.start()
+
+    def capture(self, surface):
+        ''' copy a finished frame to a free buffer. doesn't allocate or wait on disk.
+        returns False if the frame was dropped because every buffer is waiting to be written '''
+        with self.lock:
+            if not self.recording: return True # stopped since the caller checked
+            if not self.free:
+                self.dropped += 1
+                return False
+            i = self.free.popleft()
+            self.buffers[i].blit(surface, (0,0))
+            self.buffer_times[i] = perf_counter() -self.start_time
+            self.filled.put(i)
+        return True
+
+    def write(self):
+        ''' writer thread. writes filled buffers in order until stopped '''
+        times = open(f'{self.folder}/times.txt', 'w')
+        raw = open(f'{self.folder}/frames.rgb', 'wb') if self.format == 'raw' else None
+        while True:
+            i = self.filled.get()
+            if i == None: break
+            if raw: raw.write(pg.image.tobytes(self.buffers[i], 'RGB'))
+            else: pg.image.save(self.buffers[i], f'{self.folder}/{self.captured:06d}.png')
+            times.write(f'{self.buffer_times[i]:.6f}\n')
+            self.free.append(i)
+            self.captured += 1
+        times.close()
+        if raw: raw.close()
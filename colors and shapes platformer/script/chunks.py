@@ -0,0 +1,106 @@
+import pygame as pg
+from collections import deque
+from time import perf_counter
+from script.settings import *
+
+REMOVED = 'removed' # saved state for objects that were destroyed (e.g. unlocked Doors)
+
+class ChunkGrid():
+    ''' splits a level's objects into square chunks (CHUNK_SIZE pixels wide).
+    only chunks near the camera or the player's current views are instantiated (and updated).
+    far away chunks are unloaded and the state of their objects is saved until they're loaded again.
+    chunks on screen are loaded right away, chunks in the margin around it are loaded over several frames '''
+    def __init__(self, level, records):
+        self.level = level
+        self.chunks = {} # maps (column, row) to a list of TiledObjects that overlap that chunk
+        self.record_chunks = {} # maps Tiled object ids to the chunks that object overlaps
+        for record in records: self.add(record)
+
+        self.loaded = set() # chunks whose objects are currently instantiated
+        self.queue = deque() # chunks waiting to be loaded ahead of time
+        self.saved = {} # maps Tiled object ids to the saved state of unloaded objects
+
+    def add(self, record):
+        ''' add a TiledObject to every chunk it overlaps '''
+        chunks = self.get_chunks(pg.Rect(record.x, record.y, record.width, record.height))
+        self.record_chunks[record.id] = chunks
+        for chunk in chunks: self.chunks.setdefault(chunk, []).append(record)
+
+    def remove(self, record):
+        ''' remove a TiledObject from the grid. does NOT unload it '''
+        for chunk in self.record_chunks.pop(record.id, []): self.chunks[chunk].remove(record)
+        self.saved.pop(record.id, None)
+
+    def get_chunks(self, rect):
+        ''' returns the chunks that a pg.Rect overlaps '''
+        return [(col, row) for col in range(rect.left//CHUNK_SIZE, (rect.right -1)//CHUNK_SIZE +1)
+                           for row in range(rect.top//CHUNK_SIZE, (rect.bottom -1)//CHUNK_SIZE +1)]
+
+    def update(self):
+        ''' load chunks near the camera and unload far away chunks. called every frame '''
+        screen = pg.Rect(self.level.game.camera_offset, RES)
+        areas = [screen] +self.level.get_view(self.level.game.player)
+
+        # chunks on screen are needed this frame
+        visible = set(self.get_chunks(screen))
+        for chunk in visible - self.loaded: self.load(chunk)
+
+        # chunks near the screen or current views are loaded ahead of time
+        nearby = set()
+        for area in areas: nearby.update(self.get_chunks(area.inflate(CHUNK_MARGIN*2, CHUNK_MARGIN*2)))
+        for chunk in nearby - self.loaded:
+            if chunk not in self.queue: self.queue.append(chunk)
+
+        # unload chunks that are far away. keep a chunk of extra margin so chunks don't load and unload repeatedly at the edge
+        keep = set()
+        for area in areas: keep.update(self.get_chunks(area.inflate(CHUNK_MARGIN*2 +CHUNK_SIZE*2, CHUNK_MARGIN*2 +CHUNK_SIZE*2)))
+        for chunk in self.loaded - keep: self.unload(chunk)
+
+        # load queued chunks until out of time for this frame
+        start = perf_counter()
+        while self.queue and perf_counter() -start < CHUNK_LOAD_BUDGET:
+            chunk = self.queue.popleft()
+            if chunk in keep: self.load(chunk) # skip chunks that are no longer nearby
+
+    def load(self, chunk):
+        ''' instantiate a chunk's objects and restore their saved state '''
+        self.loaded.add(chunk)
+        for record in self.chunks.get(chunk, []): self.load_object(record)
+
+    def unload(self, chunk):
+        ''' save the state of a chunk's objects and destroy them '''
+        self.loaded.discard(chunk)
+        for record in self.chunks.get(chunk, []): 
+            if not any(c in self.loaded for c in self.record_chunks[record.id]): self.unload_object(record) # not in another loaded chunk
+
+    def load_object(self, record):
+        if self.level.get_object(record.id) != None or self.saved.get(record.id) == REMOVED: return # already loaded or destroyed
+        state = self.saved.pop(record.id, None)
+        sprite = self.level.create_object(record)
+        if state: sprite.restore_state(state)
+
+    def unload_object(self, record):
+        sprite = self.level.get_object(record.id)
+        if sprite == None or getattr(sprite, 'follow_obj', None): return # not loaded, or a key that's following the player
+
+        if not sprite.alive(): self.saved[record.id] = REMOVED
+        else:
+            state = sprite.save_state()
+            if state: self.saved[record.id] = state
+            sprite.kill()
+        self.level.remove_object(record.id)
+
+    def move(self, old, new):
+        ''' update the chunks of an object whose TiledObject changed (see Level.reload). 
+        loads or unloads the object if it moved into or out of the loaded chunks '''
+        state = self.saved.get(old.id)
+        self.remove(old)
+        self.add(new)
+        if state: self.saved[new.id] = state
+
+        if any(c in self.loaded for c in self.record_chunks[new.id]): self.load_object(new)
+        else: self.unload_object(new)
+
+    def reset(self):
+        ''' forget saved state that gets reset when the level is loaded (e.g. collected Orbs) '''
+        self.saved = {id: state for id, state in self.saved.items() if state == REMOVED}
@@ -0,0 +1,109 @@
+''' swept (continuous) AABB collision.
+instead of moving a box and checking what it overlaps, find when during the move it first touches something.
+fast objects or long frames can't skip through thin objects this way.
+boxes are (x, y, w, h) with float positions. moves are (dx, dy) in pixels '''
+import pygame as pg
+from math import inf, ceil
+from weakref import WeakKeyDictionary
+from script.settings import *
+from script.utilities import sign
+
+masks = WeakKeyDictionary() # maps images to masks of their opaque pixels. forgotten when the image is no longer used
+
+def axis_times(start, size, move, target_start, target_size):
+    ''' returns (entry, exit) times along one axis as fractions of the move.
+    None if the boxes never overlap on this axis '''
+    if move > 0: return (target_start -(start +size))/move, (target_start +target_size -start)/move
+    if move < 0: return (target_start +target_size -start)/move, (target_start -(start +size))/move
+    if start +size <= target_start or start >= target_start +target_size: return None # not moving and not overlapping
+    return -inf, inf
+
+def sweep(box, dx, dy, target):
+    ''' sweep a box along (dx, dy) against a pg.Rect.
+    returns (entry, exit, normal) where entry and exit are the fractions of the move where the boxes start and stop overlapping,
+    and normal is the side of target that was hit, e.g. (0, -1) for its top. None if they never overlap '''
+    x, y, w, h = box
+    x_times = axis_times(x, w, dx, target.x, target.w)
+    y_times = axis_times(y, h, dy, target.y, target.h)
+    if x_times == None or y_times == None: return None
+
+    entry, exit = max(x_times[0], y_times[0]), min(x_times[1], y_times[1])
+    if entry >= exit: return None # touching edges or corners isn't a collision
+    normal = (-sign(dx), 0) if x_times[0] > y_times[0] else (0, -sign(dy))
+    return entry, exit, normal
+
+def get_area(box, dx, dy):
+    ''' returns a pg.Rect around the area covered by the whole move. 
+    for finding the objects that a move could hit (e.g. Level.get_solids) '''
+    x, y, w, h = box
+    return pg.Rect(int(min(x, x +dx)) -1, int(min(y, y +dy)) -1, ceil(w +abs(dx)) +2, ceil(h +abs(dy)) +2)
+
+def push_out(box, rect):
+    ''' returns the shortest (dx, dy) along one axis that moves a box out of a pg.Rect it overlaps, or None if they don't overlap '''
+    x, y, w, h = box
+    left, right = rect.left -(x +w), rect.right -x # moves that put the box beside the rect
+    up, down = rect.top -(y +h), rect.bottom -y
+    if left >= 0 or right <= 0 or up >= 0 or down <= 0: return None
+    dx = left if -left < right else right
+    dy = up if -up < down else down
+    return (dx, 0) if abs(dx) < abs(dy) else (0, dy)
+
+def resolve(box, sprites):
+    ''' returns a box moved out of the sprites it overlaps, along the shallowest axis of each overlap (see push_out) '''
+    x, y, w, h = box
+    for sprite in sprites:
+        push = push_out((x, y, w, h), sprite.rect)
+        if push: x, y = x +push[0], y +push[1]
+    return x, y, w, h
+
+def cast(box, dx, dy, sprites):
+    ''' find the first sprites hit by a box moving along (dx, dy).
+    sprites the box already overlaps are hit at the start if the move goes further into them, and ignored otherwise.
+    returns (time of impact as a fraction of the move, contact normal, list of sprites hit at that time).
+    time is 1 and normal is None if nothing is hit '''
+    time, normal, hits = 1, None, []
+    for sprite in sprites:
+        result = sweep(box, dx, dy, sprite.rect)
+        if result == None: continue
+        entry, exit, sprite_normal = result
+        if entry < 0: # overlapping at the start
+            push = push_out(box, sprite.rect)
+            if push == None or push[0]*dx +push[1]*dy >= 0: continue # moving out of it
+            entry, sprite_normal = 0, (sign(push[0]), sign(push[1]))
+        if entry > time: continue # hit later
+        if entry < time: time, normal, hits = entry, sprite_normal, []
+        hits.append(sprite)
+    return time, normal, hits
+
+def touched(box, dx, dy, sprites):
+    ''' returns sprites that a box overlaps at any point while moving along (dx, dy) (including the start), in the order they're touched '''
+    hits = []
+    for sprite in sprites:
+        result = sweep(box, dx, dy, sprite.rect)
+        if result and result[0] < 1 and result[1] > 0: hits.append((result[0], sprite))
+    return [sprite for entry, sprite in sorted(hits, key=lambda hit: hit[0])]
+
+def substeps(dx, dy):
+    ''' number of steps to split a move into so that axis by axis movement follows the diagonal closely (see COLLISION_SUBSTEP) '''
+    if not COLLISION_SUBSTEP: return 1
+    return max(1, ceil(max(abs(dx), abs(dy))/COLLISION_SUBSTEP))
+
+def get_mask(image):
+    ''' returns a pg.mask.Mask of an image's opaque pixels. 
+    made the first time an image is checked and shared by every object that uses the image (e.g. each color and flip of spikes) '''
+    mask = masks.get(image)
+    if mask == None: mask = masks[image] = pg.mask.from_surface(image)
+    return mask
+
+def touches_pixels(box, dx, dy, image, sprite):
+    ''' pixel accurate check for a box with an image moving along (dx, dy) against a sprite.
+    only checks the part of the move where their rects overlap, every MASK_STEP pixels '''
+    result = sweep(box, dx, dy, sprite.rect)
+    if result == None: return False
+    start, end = max(result[0], 0), min(result[1], 1)
+    mask, sprite_mask, rect = get_mask(image), get_mask(sprite.image), sprite.rect
+    steps = max(1, ceil(max(abs(dx), abs(dy))*(end -start)/MASK_STEP))
+    for step in range(steps +1):
+        time = start +(end -start)*step/steps
+        if sprite_mask.overlap(mask, (round(box[0] +dx*time) -rect.x, round(box[1] +dy*time) -rect.y)): return True
+    return False
@@ -0,0 +1,67 @@
+import pygame as pg
+from collections import namedtuple
+from time import perf_counter
+from script.settings import *
+
+# maps actions to key bindings (see settings.py)
+ACTIONS = {
+    'jump': K_JUMP,
+    'left': K_LEFT,
+    'right': K_RIGHT,
+    'lvl_change': K_LVL_CHANGE,
+    'reset': K_RESET,
+    'save_telemetry': K_SAVE_TELEMETRY,
+    'memory_report': K_MEMORY_REPORT,
+    'capture': K_CAPTURE
+}
+
+# immutable record of the player's input for one frame.
+# time: when the input was sampled (perf_counter)
+# quit: whether the game window was closed or the quit key was pressed
+# held: actions whose keys are currently held down
+# pressed: actions whose keys were pressed recently (buffered for INPUT_BUFFER frames or until consumed)
+InputSnapshot = namedtuple('InputSnapshot', ['time', 'quit', 'held', 'pressed'])
+NO_INPUT = InputSnapshot(0, False, frozenset(), frozenset())
+
+class Controls():
+    ''' samples input once per frame and hands out immutable InputSnapshots.
+    also measures the latency between sampling input and showing the result on screen '''
+    def __init__(self):
+        self.snapshot = NO_INPUT
+        self.buffer = {} # maps pressed actions to the number of frames they stay buffered for
+        
+        # input-to-display latency (in seconds)
+        self.latency = 0 # smoothed over recent frames
+        self.max_latency = 0
+
+    def sample(self):
+        ''' drain the event queue and read the keyboard. 
+        call as late as possible in the frame (after waiting on the clock) 
+        clearing event queue each frame prevents crashes '''
+        # age buffered presses from previous frames
+        for action in list(self.buffer.keys()):
+            self.buffer[action] -= 1
+            if self.buffer[action] <= 0: del self.buffer[action]
+
+        quit = False
+        for event in pg.event.get(): 
+            if event.type == pg.QUIT or (event.type == pg.KEYDOWN and event.key == pg.K_ESCAPE): quit = True
+            elif event.type == pg.KEYDOWN:
+                for action, key in ACTIONS.items():
+                    if event.key == key: self.buffer[action] = INPUT_BUFFER
+
+        keys_pressed = pg.key.get_pressed()
+        held = frozenset(action for action, key in ACTIONS.items() if keys_pressed[key])
+        self.snapshot = InputSnapshot(perf_counter(), quit, held, frozenset(self.buffer.keys()))
+        return self.snapshot
+
+    def consume(self, action):
+        ''' remove a buffered press so it only triggers once (e.g. one jump per press) '''
+        self.buffer.pop(action, None)
+
+    def presented(self, input_time=None):
+        ''' call right after the display is updated to measure input-to-display latency.
+        input_time: when the input of the frame that was shown was sampled. defaults to the latest snapshot '''
+        latency = perf_counter() -(input_time or self.snapshot.time)
+        self.latency += (latency -self.latency)/10 
+        self.max_latency = max(self.max_latency, latency)
@@ -1,4 +1,6 @@
 import pygame as pg
+from contextlib import contextmanager
+from time import perf_counter
 from script.settings import *
 
 def draw_debug(game):
@@ -19,3 +21,50 @@ def draw_debug(game):
     # player velocity
     text = pg.font.Font(None, 24).render(f'player vel: <{int(game.player.x_vel)}, {int(game.player.y_vel)}>', True, (0,0,0))
     game.game_surface.blit(text, (60,30))
+
+    # input-to-display latency
+    text = pg.font.Font(None, 24).render(f'input latency: {game.controls.latency*1000:.1f} ms (max {game.controls.max_latency*1000:.1f} ms)', True, (0,0,0))
+    game.game_surface.blit(text, (60,50))
+
+
+class StartupProfiler():
+    ''' cold-start profiler. breaks startup time down into named sections.
+    sections can be nested; time spent in a nested section (e.g. asset decode during level parse) 
+    is only counted towards the nested section.
+    stops recording after the first frame has been reported (see report) '''
+    def __init__(self):
+        self.enabled = PROFILE_STARTUP
+        self.start = perf_counter() # set again by main.py before imports
+        self.times = {} # maps section names to time spent in them (in seconds)
+        self.stack = [] # time spent in nested sections, one entry for each open section
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled: 
+            yield
+            return
+        
+        start = perf_counter()
+        self.stack.append(0)
+        try: yield
+        finally:
+            elapsed = perf_counter() -start
+            self.add(name, elapsed -self.stack.pop())
+            if self.stack: self.stack[-1] += elapsed # don't count this section's time towards its parent
+
+    def add(self, name, seconds):
+        self.times[name] = self.times.get(name, 0) +seconds
+
+    def report(self):
+        ''' prints the cold-start breakdown. called once the first frame is on the screen '''
+        if not self.enabled: return
+        self.enabled = False 
+
+        total = perf_counter() -self.start
+        print('cold start breakdown:')
+        for name, seconds in self.times.items():
+            print(f'    {name:<14}{seconds*1000:8.1f} ms')
+        print(f'    {"other":<14}{(total -sum(self.times.values()))*1000:8.1f} ms')
+        print(f'time to first frame: {total*1000:.1f} ms')
+
+STARTUP = StartupProfiler()
@@ -0,0 +1,159 @@
+''' procedural stress levels for scalability testing.
+writes a world folder that can be loaded by the game or benchmarks (see benchmark.py):
+    <folder>/level/<color>.tmx for each color, plus Objects.tsx
+    <folder>/img and <folder>/sound link to the game's folders
+run from the game's folder, e.g. 10x, 100x, and 1000x the objects in the shipped levels:
+    python -m script.generate_level stress/10x --size 200 120 --rooms 24
+    python -m script.generate_level stress/100x --size 640 400 --rooms 240
+    python -m script.generate_level stress/1000x --size 2000 1300 --rooms 2400 '''
+import argparse, os, random, shutil
+import xml.etree.ElementTree as ET
+from script.settings import TILE_SIZE, COLORS
+
+# gids of object images in Objects.tsx (firstgid is 1)
+GIDS = {'Checkpoint': 1, 'Portal': 2, 'Spike': 3, 'Platform': 5, 'Key': 6, 'Orb': 7, 'Bouncer': 8, 'Door': 10}
+SIZES = {'Checkpoint': (144, 144), 'Portal': (54, 64), 'Spike': (32, 32), 'Key': (40, 24), 'Orb': (32, 32), 'Bouncer': (32, 32), 'Door': (32, 96)}
+MIN_ROOM_SIZE = (12, 8) # (in tiles)
+SHAFT_WIDTH = 3 # width of the holes that connect rows of rooms (in tiles)
+
+class LevelGenerator():
+    ''' generates one level. the map is split into a grid of rooms, each with its own view.
+    every room has a floor, walls with doorways to the rooms next to it, ledges, and objects placed on the floor.
+    rows are connected by a shaft that drops into the row below, alternating between the last and first column,
+    so every room can be reached from the first one '''
+    def __init__(self, color, size, rooms, density, colors, mix, checkpoint):
+        self.color = color
+        self.width, self.height = size # (in tiles)
+        self.density = density # chance of each floor tile having a spike. other objects scale with it
+        self.colors = colors # levels that portals can lead to
+        self.mix = mix # colors of spikes, orbs, keys, doors, and bouncers
+        self.checkpoint = checkpoint # whether the first room has a checkpoint (start level)
+
+        # split map into a grid of rooms with the same aspect ratio as the map
+        self.columns = max(1, min(self.width//MIN_ROOM_SIZE[0], round((rooms*self.width/self.height)**.5)))
+        self.rows = max(1, min(self.height//MIN_ROOM_SIZE[1], -(-rooms//self.columns)))
+        self.room_w, self.room_h = self.width//self.columns, self.height//self.rows
+
+        self.next_id = 1
+        self.objects, self.views = [], []
+
+    def add(self, type, x, y, w=None, h=None, name=None):
+        ''' add an object. x and y are the top left corner (in pixels) '''
+        if w == None: w, h = SIZES[type]
+        self.objects.append((self.next_id, type, name, x, y, w, h))
+        self.next_id += 1
+
+    def generate(self):
+        for row in range(self.rows):
+            for column in range(self.columns):
+                self.generate_room(column, row)
+        return self
+
+    def shaft_column(self, row):
+        ''' column of the room whose floor drops into the next row '''
+        return self.columns -1 if row % 2 == 0 else 0
+
+    def add_span(self, left, y, w, gap=None):
+        ''' add a floor or ceiling. gap: x of a shaft to leave open, or None '''
+        if gap == None: return self.add('Platform', left, y, w, TILE_SIZE)
+        self.add('Platform', left, y, gap -left, TILE_SIZE)
+        self.add('Platform', gap +SHAFT_WIDTH*TILE_SIZE, y, left +w -gap -SHAFT_WIDTH*TILE_SIZE, TILE_SIZE)
+
+    def generate_room(self, column, row):
+        left, top = column*self.room_w*TILE_SIZE, row*self.room_h*TILE_SIZE
+        w, h = self.room_w*TILE_SIZE, self.room_h*TILE_SIZE
+        floor = top +h -TILE_SIZE # top of the floor
+        first = column == row == 0
+        self.views.append((self.next_id, f'room{len(self.views)}', left +TILE_SIZE, top +TILE_SIZE, w -TILE_SIZE*2, h -TILE_SIZE*2))
+        self.next_id += 1
+
+        # floor and ceiling. shafts are near the right wall so they're clear of the first room's checkpoint
+        shaft = left +w -TILE_SIZE*(SHAFT_WIDTH +2)
+        drop = row < self.rows -1 and column == self.shaft_column(row) # shaft down to the next row
+        self.add_span(left, floor, w, shaft if drop else None)
+        self.add_span(left, top, w, shaft if row > 0 and column == self.shaft_column(row -1) else None)
+
+        # walls with doorways to the rooms next to this one. the edges of the map are closed
+        door_h = TILE_SIZE*4
+        left_door, right_door = door_h if column > 0 else 0, door_h if column < self.columns -1 else 0
+        self.add('Platform', left, top +TILE_SIZE, TILE_SIZE, h -TILE_SIZE*2 -left_door) # left wall
+        self.add('Platform', left +w -TILE_SIZE, top +TILE_SIZE, TILE_SIZE, h -TILE_SIZE*2 -right_door) # right wall
+
+        # ledges
+        for _ in range(random.randint(1, 3)):
+            ledge_w = random.randint(2, max(2, self.room_w//3))*TILE_SIZE
+            self.add('Platform', random.randrange(left +TILE_SIZE, left +w -TILE_SIZE -ledge_w +1, TILE_SIZE),
+                     random.randrange(top +TILE_SIZE*3, floor -TILE_SIZE*2, TILE_SIZE), ledge_w, TILE_SIZE)
+
+        # keep the first room safe to spawn in
+        start = left +TILE_SIZE*2
+        if first:
+            if self.checkpoint: self.add('Checkpoint', start, floor -TILE_SIZE -SIZES['Checkpoint'][1], name=self.color)
+            start += SIZES['Checkpoint'][0] +TILE_SIZE*2
+
+        # objects on the floor
+        for x in range(start, left +w -TILE_SIZE*3, TILE_SIZE):
+            if drop and x > shaft -TILE_SIZE*2: break # keep the way into the shaft clear
+            roll = random.random()
+            if roll < self.density: self.add('Spike', x, floor -TILE_SIZE, name=random.choice(self.mix))
+            elif roll < self.density*1.1: self.add('Orb', x, floor -TILE_SIZE*3, name=random.choice(self.mix))
+            elif roll < self.density*1.15: self.add('Key', x, floor -TILE_SIZE*2, name=random.choice(self.mix))
+            elif roll < self.density*1.2: self.add('Bouncer', x, floor -TILE_SIZE, name=random.choice(self.mix))
+            elif roll < self.density*1.25 and x < left +w -TILE_SIZE*4: self.add('Door', x, floor -SIZES['Door'][1], name=random.choice(self.mix))
+            elif roll < self.density*1.27: self.add('Portal', x, floor -SIZES['Portal'][1], name=random.choice(self.colors))
+
+    def write(self, filename):
+        ''' write the level as a Tiled tmx file '''
+        root = ET.Element('map', version='1.10', tiledversion='1.10.0', orientation='orthogonal', renderorder='right-down',
+                          width=str(self.width), height=str(self.height), tilewidth=str(TILE_SIZE), tileheight=str(TILE_SIZE),
+                          infinite='0', nextlayerid='3', nextobjectid=str(self.next_id))
+        ET.SubElement(root, 'tileset', firstgid='1', source='Objects.tsx')
+
+        views = ET.SubElement(root, 'objectgroup', id='1', name='Views', visible='0')
+        for id, name, x, y, w, h in self.views:
+            ET.SubElement(views, 'object', id=str(id), name=name, x=str(x), y=str(y), width=str(w), height=str(h))
+
+        objects = ET.SubElement(root, 'objectgroup', id='2', name='Objects')
+        for id, type, name, x, y, w, h in self.objects:
+            obj = ET.SubElement(objects, 'object', id=str(id))
+            if name: obj.set('name', name)
+            obj.set('type', type)
+            obj.set('gid', str(GIDS[type]))
+            obj.set('x', str(x))
+            obj.set('y', str(y +h)) # Tiled uses the bottom left corner for tile objects
+            obj.set('width', str(w))
+            obj.set('height', str(h))
+
+        ET.indent(root, ' ')
+        ET.ElementTree(root).write(filename, encoding='UTF-8', xml_declaration=True)
+
+def generate_world(folder, size, rooms, density, colors, mix, seed=None):
+    ''' write a level for each color to folder/level. the first color is the start level (has the checkpoint) '''
+    random.seed(seed)
+    os.makedirs(os.path.join(folder, 'level'), exist_ok=True)
+    shutil.copy('level/Objects.tsx', os.path.join(folder, 'level'))
+    for assets in ('img', 'sound'): # link to the game's images and sounds
+        if os.path.exists(os.path.join(folder, assets)): continue
+        try: os.symlink(os.path.abspath(assets), os.path.join(folder, assets), target_is_directory=True)
+        except OSError: shutil.copytree(assets, os.path.join(folder, assets)) # symlinks not allowed
+
+    counts = {}
+    for i, color in enumerate(colors):
+        level = LevelGenerator(color, size, rooms, density, colors, mix, checkpoint=i == 0).generate()
+        level.write(os.path.join(folder, 'level', color+'.tmx'))
+        counts[color] = len(level.objects)
+        print(f'{color}: {len(level.objects)} objects in {len(level.views)} rooms')
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='generate stress test levels')
+    parser.add_argument('folder', help='world folder to write levels to')
+    parser.add_argument('--size', type=int, nargs=2, default=(200, 120), metavar=('WIDTH', 'HEIGHT'), help='map size in tiles')
+    parser.add_argument('--rooms', type=int, default=24, help='number of rooms (each with a view)')
+    parser.add_argument('--density', type=float, default=.3, help='chance of each floor tile having a spike. other objects scale with it')
+    parser.add_argument('--colors', nargs='+', default=['white', 'red', 'orange'], choices=COLORS.keys(), help='levels to generate. the first is the start level')
+    parser.add_argument('--mix', nargs='+', default=None, choices=COLORS.keys(), help='object colors. default: same as --colors')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    generate_world(args.folder, args.size, args.rooms, args.density, args.colors, args.mix or args.colors, args.seed)
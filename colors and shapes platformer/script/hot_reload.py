@@ -0,0 +1,47 @@
+import os
+from time import perf_counter
+from script.settings import *
+from script.level import TmxReader, diff_records
+
+class LevelWatcher():
+    ''' watches the tmx files of loaded levels and reloads a level when its file is saved (e.g. from Tiled).
+    edited files are read a piece at a time (up to HOT_RELOAD_BUDGET per frame), since reading a big level takes longer than a frame.
+    only objects that changed are updated (see Level.reload) '''
+    def __init__(self, game):
+        self.game = game
+        self.mtimes = {} # maps level names to the last modified time of their tmx files
+        self.timer = 0 # time until files are checked again (in seconds)
+        self.readers = {} # maps names of edited levels to TmxReaders that are reading their files
+
+    def update(self, dt):
+        if self.readers: self.read()
+        self.timer -= dt
+        if self.timer > 0: return
+        self.timer = HOT_RELOAD_INTERVAL
+
+        for name, level in self.game.levels.items():
+            try: mtime = os.stat('level/'+name+'.tmx').st_mtime_ns
+            except OSError: continue # file is being saved
+
+            if name not in self.mtimes: self.mtimes[name] = mtime # level was just loaded
+            elif mtime != self.mtimes[name] and name not in self.readers: # saved again while being read: checked after it's done
+                self.mtimes[name] = mtime
+                try: self.readers[name] = TmxReader(name)
+                except OSError: continue # file is being saved
+
+    def read(self):
+        ''' continue reading edited files. reloads levels whose files have been read '''
+        start = perf_counter()
+        for name, reader in list(self.readers.items()):
+            budget = HOT_RELOAD_BUDGET -(perf_counter() -start)
+            if budget <= 0: return
+            try: 
+                if not reader.read(budget): continue
+                del self.readers[name]
+                level = dict(self.game.levels.items()).get(name)
+                if level == None: continue # evicted while its file was being read
+                records = {record.id: record for record in reader.records}
+                level.reload((records, reader.views, diff_records(level.records, records)))
+            except Exception as e: # keep playing if the file is invalid
+                self.readers.pop(name, None)
+                print(f'could not reload level \'{name}\': {e}')
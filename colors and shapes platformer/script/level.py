@@ -1,12 +1,84 @@
-from pytmx.util_pygame import load_pygame # for loading tmx files
+import xml.etree.ElementTree as ET
+from collections import namedtuple, deque
+from time import perf_counter
 from script.settings import *
 from script.objects import *
 from script.sprites import Particle
-from script.debug import draw_debug
+from script.debug import draw_debug, STARTUP
+from script.chunks import ChunkGrid, REMOVED
+from script.telemetry import LEVEL_RELOAD, CAPTURE_DROP
+from script.resources import surface_size
+from script.render import RenderList
+from script.scheduler import UpdateScheduler
+from script.static import StaticObjects, StaticObject, TYPES as STATIC_TYPES
+
+# object data from a tmx file. only what's needed to create the object
+TiledObject = namedtuple('TiledObject', ['id', 'type', 'name', 'x', 'y', 'width', 'height'])
+
+class TmxReader():
+    ''' reads the Objects and Views layers of a level's tmx file (from Tiled) a piece at a time,
+    so big levels can be read between frames (see hot_reload.py). 
+    only reads object attributes, which is much faster than loading the whole map with pytmx '''
+    def __init__(self, filename):
+        # filename is a color string
+        self.name = filename
+        self.file = open('level/'+filename+'.tmx', 'rb')
+        self.parser = ET.XMLPullParser(('start', 'end'))
+        self.layer = None # name of the object layer being read
+        self.records = [] # TiledObjects from the Objects layer
+        self.views = {} # camera bounds. key: view name, value: list of pg.Rects
+
+    def read(self, budget=None):
+        ''' parse the file for up to budget seconds, or all of it if None. returns whether the whole file has been read '''
+        start = perf_counter()
+        while budget == None or perf_counter() -start < budget:
+            chunk = self.file.read(TMX_CHUNK)
+            if not chunk:
+                self.file.close()
+                self.parser.close()
+                return True
+            self.parser.feed(chunk)
+            for event, element in self.parser.read_events(): self.read_element(event, element)
+        return False
+
+    def read_element(self, event, element):
+        if element.tag == 'objectgroup': self.layer = element.get('name') if event == 'start' else None
+        elif element.tag == 'object' and event == 'end':
+            obj = element.attrib
+            x, y, w, h = float(obj['x']), float(obj['y']), float(obj.get('width', 0)), float(obj.get('height', 0))
+            if 'gid' in obj: y -= h # Tiled uses the bottom left corner for tile objects
+            
+            # get objects in level
+            if self.layer == 'Objects': self.records.append(TiledObject(int(obj['id']), obj.get('type', obj.get('class')), obj.get('name'), x, y, w, h))
+
+            # get views (camera bounds for various rooms)
+            elif self.layer == 'Views': self.views.setdefault(obj.get('name'), []).append(pg.Rect(x, y, w, h))
+            element.clear() # free the parsed element
+
+def read_tmx(filename):
+    ''' reads a level's tmx file (from Tiled). 
+    returns a list of TiledObjects from the Objects layer and
+    a dict of views (camera bounds). key: view name, value: list of pg.Rects '''
+    reader = TmxReader(filename)
+    reader.read()
+    return reader.records, reader.views
+
+def diff_records(old, new):
+    ''' returns ids of Tiled objects that were added, removed, or changed between two dicts of TiledObjects '''
+    return [id for id in old.keys() | new.keys() if old.get(id) != new.get(id)]
+
+def read_changes(filename, old):
+    ''' read a level's tmx file and compare its objects with old (a dict of TiledObjects).
+    returns (dict of TiledObjects, views, ids of objects that changed) for Level.reload '''
+    records, views = read_tmx(filename)
+    records = {record.id: record for record in records}
+    return records, views, diff_records(old, records)
 
 class Level():
-    def __init__(self, game, filename):
-        ''' load a level from a tmx file, create objects, and add them to the appropriate groups '''
+    def __init__(self, game, filename, build=True, tmx=None):
+        ''' load a level from a tmx file, create objects, and add them to the appropriate groups.
+        build: whether to create the objects now. if False, they're created by calling build (e.g. over several frames, see warmup.py)
+        tmx: (records, views) already read from the file (e.g. by a TmxReader over several frames). the file is read now if None '''
         self.name = filename # color 
         self.game = game
 
@@ -21,10 +93,19 @@ class Level():
         self.decorative_objs = pg.sprite.Group() # non-interactive objects
         self.inactive = pg.sprite.Group() # objects that are not currently active (e.g. collected Orbs)
         self.particles = pg.sprite.Group()
+        self.scheduler = UpdateScheduler(self) # decides which objects are updated each frame
         
         # create objects and add them to groups
         self.views = {} # camera bounds. key: view name, value: pg.Rect
-        self.get_objects_from_tmx(filename)
+        self.objects = {} # maps Tiled object ids to live objects
+        self.statics = StaticObjects(self) if STATIC_ARRAYS else None # platforms and spikes. not in self.objects or any groups (see static.py)
+        self.images_held = set() # keys of images in Game.images used by this level's objects
+        self.sounds_held = set() # keys of sounds in Game.sounds played by this level's objects
+        self.spike_images = {} # maps (color, flip x, flip y) to flipped images shared by Spikes
+        self.chunks = None # ChunkGrid if level is streamed in chunks
+        with STARTUP.section('level parse'): 
+            self.get_objects_from_tmx(filename, tmx)
+            if build: self.build()
 
         ## use color shift settings to get level colors 
         # background 
@@ -38,70 +119,253 @@ class Level():
         elif filename == 'orange': color_shift = int(color_shift*ORANGE_SHIFT_COEF)
         self.fg_color = tuple(min(255, max(0, rgb+color_shift)) for rgb in COLORS[filename])
         
-    def get_objects_from_tmx(self, filename):
+    def get_objects_from_tmx(self, filename, tmx=None):
         ''' load level data from tmx file,
         use it to create objects,
-        and add them to the appropriate groups. '''
-        # filename is a color string
-        tmx_data = load_pygame('level/'+filename+'.tmx') 
-
-        for layer in tmx_data.layers: 
-            # create objects in level
-            if layer.name == 'Objects':
-                for obj in layer:
-                    if obj.type == 'Platform':
-                        Platform(self, (obj.x, obj.y), obj.width, obj.height, filename)
-                    elif obj.type == 'Checkpoint':
-                        sprite = Checkpoint(self, (obj.x, obj.y), filename)
-                        self.game.active_checkpoint = sprite
-                    else:
-                        if obj.type == None: raise ValueError(f"Invalid object type in level \'{filename}\'.\nCheck object Class in Tiled.")
-                        sprite = eval(obj.type + '(self, (obj.x, obj.y), obj.name)' ) # create object
-            
-            # get views (camera bounds for various rooms)
-            elif layer.name == 'Views':
-                for obj in layer:
-                    if obj.name not in self.views.keys(): self.views[obj.name] = [pg.Rect(obj.x, obj.y, obj.width, obj.height)]
-                    else: self.views[obj.name].append(pg.Rect(obj.x, obj.y, obj.width, obj.height))
-            
-    def run(self, delta_time):
-        self.update(delta_time)
+        and add them to the appropriate groups. 
+        big levels are split into chunks that are loaded as the camera gets close to them (see chunks.py) '''
+        records, self.views = tmx or read_tmx(filename)
+        self.records = {record.id: record for record in records} # maps Tiled object ids to object data
+
+        if STREAM_LEVELS and len(records) >= STREAM_MIN_OBJECTS: self.chunks = ChunkGrid(self, []) # records are added by build
+        self.unbuilt = deque(records) # records whose objects haven't been created or added to chunks yet (see build)
+
+    def build(self, budget=None):
+        ''' create the objects of unbuilt records, or add them to their chunks if the level is streamed (pinned types are always created).
+        budget: max time to spend (in seconds), or None to build all of them.
+        returns whether every record has been built. state from before the level was evicted is restored once they are '''
+        start = perf_counter()
+        while self.unbuilt:
+            if budget != None and perf_counter() -start > budget: return False
+            record = self.unbuilt.popleft()
+            if self.chunks and record.type not in PINNED_TYPES: self.chunks.add(record)
+            else: self.create_object(record)
+        self.restore_state(self.game.level_states.pop(self.name, {}))
+        return True
+
+    def create_object(self, record):
+        ''' create an object from a TiledObject record and add it to the appropriate groups '''
+        with self.game.images.track() as used: sprite = self.new_object(record)
+        self.hold_images(used)
+        if type(sprite) == StaticObject: return sprite # stored in self.statics
+        
+        sprite.tiled_id = record.id
+        self.objects[record.id] = sprite
+        self.scheduler.register(sprite)
+        return sprite
+
+    def new_object(self, record):
+        pos = (record.x, record.y)
+        if self.statics != None and record.type in STATIC_TYPES: 
+            sprite = self.statics.add(record)
+        elif record.type == 'Platform':
+            sprite = Platform(self, pos, record.width, record.height, self.name)
+        elif record.type == 'Checkpoint':
+            sprite = Checkpoint(self, pos, self.name)
+            self.game.active_checkpoint = sprite
+        else:
+            if record.type == None: raise ValueError(f"Invalid object type in level \'{self.name}\'.\nCheck object Class in Tiled.")
+            sprite = eval(record.type + '(self, pos, record.name)' ) # create object
+        return sprite
+
+    def get_object(self, id):
+        ''' returns the live object (or StaticObject view) created from a Tiled object id, or None '''
+        sprite = self.objects.get(id)
+        if sprite == None and self.statics != None: sprite = self.statics.get(id)
+        return sprite
+
+    def remove_object(self, id):
+        ''' forget an object created from a Tiled object id (e.g. when its chunk is unloaded). does NOT kill sprites '''
+        if self.objects.pop(id, None) == None and self.statics != None and id in self.statics.index: self.statics.remove(id)
+
+    def get_solids(self, area):
+        ''' returns solid objects that overlap a pg.Rect (in level coordinates) '''
+        solids = [sprite for sprite in self.solid_objs if area.colliderect(sprite.rect)]
+        if self.statics != None: solids += self.statics.query(area, solid=True)
+        return solids
+
+    def get_interactive(self, area):
+        ''' returns interactive objects that overlap a pg.Rect (in level coordinates) '''
+        sprites = [sprite for sprite in self.interactive_objs if area.colliderect(sprite.rect)]
+        if self.statics != None: sprites += self.statics.query(area, solid=False)
+        return sprites
+
+    def is_interactive(self, sprite):
+        if type(sprite) == StaticObject: return not sprite.solid # spikes
+        return self.interactive_objs.has(sprite)
+
+    def hold_images(self, keys):
+        ''' keep images in Game.images cached while this level is loaded '''
+        for key in keys - self.images_held: self.game.images.acquire(key)
+        self.images_held |= keys
+
+    def hold_sound(self, key):
+        ''' keep a sound in Game.sounds cached while this level is loaded. the sound is still only decoded when it's first played '''
+        if key in self.sounds_held: return
+        self.game.sounds.acquire(key)
+        self.sounds_held.add(key)
+
+    def release(self):
+        ''' called when the level is evicted from Game.levels. lets its images and sounds be evicted too.
+        the state of its objects is kept in Game.level_states until the level is loaded again '''
+        for key in self.images_held: self.game.images.release(key)
+        for key in self.sounds_held: self.game.sounds.release(key)
+        self.images_held, self.sounds_held = set(), set()
+        states = self.save_state()
+        if states: self.game.level_states[self.name] = states
+
+    def save_state(self):
+        ''' returns a dict that maps Tiled object ids to the saved state of objects that changed since they were created,
+        or REMOVED for destroyed objects (e.g. unlocked Doors). includes unloaded chunks (see chunks.py) '''
+        states = dict(self.chunks.saved) if self.chunks else {}
+        for id, sprite in self.objects.items():
+            if not sprite.alive(): states[id] = REMOVED
+            else:
+                state = sprite.save_state()
+                if state: states[id] = state
+        return states
+
+    def restore_state(self, states):
+        ''' restores state returned by save_state after the level is rebuilt '''
+        for id, state in states.items():
+            if self.chunks and id in self.chunks.record_chunks: # restored when the object's chunk is loaded
+                self.chunks.saved[id] = state
+                continue
+            sprite = self.objects.get(id)
+            if sprite == None: continue # removed from the tmx file
+            if state == REMOVED: sprite.kill()
+            else: sprite.restore_state(state)
+
+    def get_size(self):
+        ''' estimated memory used by the level (in bytes). 
+        counts images owned by its objects (e.g. scaled platforms) and a rough overhead for each object.
+        images shared with other objects are counted in Game.images '''
+        counted = {id(image) for image in self.game.images.values()}
+        size = LEVEL_OBJECT_BYTES*len(self.objects)
+        for sprite in self.objects.values():
+            if id(sprite.image) not in counted: 
+                size += surface_size(sprite.image)
+                counted.add(id(sprite.image)) # images shared by several objects (e.g. flipped spikes) are counted once
+        if self.statics != None: size += self.statics.get_size()
+        return size
+
+    def reload(self, changes=None):
+        ''' reload the level's tmx file after it's been edited (see hot_reload.py).
+        compares Tiled object ids with the live level and only creates, moves, or destroys objects that changed.
+        the player is not part of the tmx file, so their position and state are kept.
+        changes: result of read_changes for this level's records (e.g. read on a worker thread). the file is read now if None '''
+        start = perf_counter()
+        records, views, ids = changes or read_changes(self.name, self.records)
+
+        for id in ids:
+            old, new = self.records.get(id), records.get(id)
+
+            if old and new and old[1:3] == new[1:3] and old[5:] == new[5:]: # same type, name, and size. only moved
+                if self.chunks and new.type not in PINNED_TYPES: self.chunks.move(old, new)
+                sprite = self.get_object(id)
+                if sprite: sprite.move_to((new.x, new.y))
+                continue
+
+            # destroy removed or changed objects
+            if old:
+                if self.chunks: self.chunks.remove(old)
+                sprite = self.get_object(id)
+                if sprite:
+                    if sprite in self.game.player.keys: self.game.player.keys.remove(sprite)
+                    sprite.kill()
+                    self.remove_object(id)
+
+            # create new or changed objects
+            if new:
+                if self.chunks and new.type not in PINNED_TYPES: 
+                    self.chunks.add(new)
+                    if any(chunk in self.chunks.loaded for chunk in self.chunks.record_chunks[id]): self.create_object(new)
+                else: self.create_object(new)
+
+        self.records, self.views = records, views
+        self.game.telemetry.event(LEVEL_RELOAD)
+        print(f'reloaded level \'{self.name}\': {len(ids)} objects changed in {(perf_counter() -start)*1000:.1f} ms')
+
+    def run(self, delta_time, inputs):
+        start = perf_counter()
+        self.update(delta_time, inputs)
+        update_time = perf_counter() -start
         self.draw(self.game.screen, self.game.game_surface, self.game.camera_offset, self.game.player)
+        if TELEMETRY: self.game.telemetry.record(self, update_time, perf_counter() -start -update_time)
+
+    def update(self, delta_time, inputs):
+        if self.chunks: self.chunks.update() # load chunks near the camera, unload far away ones
 
-    def update(self, delta_time):
         # update level objects
-        self.decorative_objs.update(delta_time)  
-        self.solid_objs.update(delta_time) 
-        self.interactive_objs.update(delta_time) 
-        self.game.player.update(delta_time) 
+        self.game.animations.update(delta_time) # shared animations (e.g. all orbs of a color)
+        self.scheduler.update(delta_time) # objects with behavior that are near the screen
+        self.game.player.update(delta_time, inputs) 
         self.particles.update(delta_time) 
         
         self.game.scroll_screen(self.game.player) # update camera (clamps to player)
 
     def draw(self, screen, game_surface, camera_offset, player):
         views = self.get_view(player) # get view that player is in
+        blits = self.get_blits(camera_offset, views, player)
+
+        # draw on the render thread while the next frame is simulated (see render.py)
+        if PIPELINED_RENDERING:
+            render_list = RenderList(tuple(self.get_background(camera_offset, views)), tuple((image, pos) for sprite, image, pos in blits))
+            shown = self.game.render_thread.draw(screen, render_list, self.game.controls.snapshot.time)
+            if shown != None: self.game.controls.presented(shown) # latency of the previous frame, which was just shown
+            return
+
+        # only redraw parts of the screen that changed when the camera is still (see render.py)
+        dirty_rects = None
+        if DIRTY_RECTS and not DEBUG: dirty_rects = self.game.dirty_renderer.get_dirty_rects(self, camera_offset, views, blits)
+
+        if dirty_rects == None: # redraw whole screen
+            self.draw_background(game_surface, camera_offset, views)
+            game_surface.blits([(image, pos) for sprite, image, pos in blits], 0) # draw game objects
+            if DEBUG: draw_debug(self.game)
+
+            # scale game_surface to display size and update display
+            pg.transform.smoothscale(game_surface, (screen.get_width(), screen.get_height()), screen)
+            pg.display.update() 
+            self.game.controls.presented()
+
+        elif dirty_rects:
+            for rect in dirty_rects:
+                game_surface.set_clip(rect) # fills and blits only change pixels inside the dirty rect
+                self.draw_background(game_surface, camera_offset, views)
+                game_surface.blits([(image, pos) for sprite, image, pos in blits if rect.colliderect(pos, image.get_size())], 0)
+            game_surface.set_clip(None)
+            self.game.dirty_renderer.present(screen, game_surface, dirty_rects)
+            self.game.controls.presented()
+
+        # copy frame for recording (see capture.py)
+        if self.game.capture.recording and not self.game.capture.capture(game_surface): self.game.telemetry.event(CAPTURE_DROP)
+
+    def draw_background(self, game_surface, camera_offset, views):
+        for color, rect in self.get_background(camera_offset, views): game_surface.fill(color, rect)
+
+    def get_background(self, camera_offset, views):
+        ''' returns a list of (color, pg.Rect on game_surface or None for whole surface) to fill in order '''
         if views:
-            game_surface.fill(self.fg_color) # draw foreground (color of platforms)
+            fills = [(self.fg_color, None)] # draw foreground (color of platforms)
             for view in views:
                 fill_rect = view.copy()
                 fill_rect.x -= camera_offset[0]
                 fill_rect.y -= camera_offset[1]
-                game_surface.fill(self.bg_color, fill_rect) 
-        else:
-            game_surface.fill(self.bg_color) # draw background
-
-        # draw game objects
-        for sprite in self.solid_objs.sprites(): sprite.draw(game_surface, camera_offset, views)
-        for sprite in self.interactive_objs.sprites(): sprite.draw(game_surface, camera_offset, views)
-        for sprite in self.decorative_objs.sprites(): sprite.draw(game_surface, camera_offset, views)
-        player.draw(game_surface, camera_offset) 
-        for sprite in self.particles.sprites(): sprite.draw(game_surface, camera_offset, views)
-
-        if DEBUG: draw_debug(self.game)
+                fills.append((self.bg_color, fill_rect))
+            return fills
+        return [(self.bg_color, None)] # draw background
 
-        # scale game_surface to display size and update display
-        pg.transform.smoothscale(game_surface, (screen.get_width(), screen.get_height()), screen)
-        pg.display.update() 
+    def get_blits(self, camera_offset, views, player):
+        ''' returns a list of (sprite, image, position on game_surface) for every object to draw this frame, in draw order '''
+        screen_rect = pg.Rect(camera_offset, RES)
+        statics = self.statics.query(screen_rect) if self.statics != None else []
+        blits = []
+        for group in ([sprite for sprite in statics if sprite.solid], self.solid_objs.sprites(), [sprite for sprite in statics if not sprite.solid], 
+                      self.interactive_objs.sprites(), self.decorative_objs.sprites(), [player], self.particles.sprites()):
+            for sprite in group:
+                if sprite.is_visible(views, screen_rect): blits.append((sprite, sprite.image, (sprite.rect.x -camera_offset[0], sprite.rect.y -camera_offset[1])))
+        return blits
 
     def get_view(self, player):
         ''' returns the view that the player is in
@@ -1,6 +1,6 @@
 import pygame as pg
 from random import random, randint
-import numpy as np
+from math import hypot
 from script.sprites import *
 from script.player import Player
 from script.utilities import scale_vector
@@ -11,9 +11,12 @@ class Spike(Sprite):
         super().__init__(level, 'spike', pos, color)
         self.set_obj_attributes(deadly=True)
         
-        # randomize image direction
-        if random() < .5: self.image = pg.transform.flip(self.image, 1, 0)
-        if random() < .5: self.image = pg.transform.flip(self.image, 0, 1)
+        # randomize image direction. spikes with the same color and flip share an image (and its collision mask)
+        flip = (random() < .5, random() < .5)
+        if any(flip):
+            key = (color, *flip)
+            if key not in level.spike_images: level.spike_images[key] = pg.transform.flip(self.image, *flip)
+            self.image = level.spike_images[key]
 
 class Platform(Sprite):
     ''' solid object player cannot move through '''
@@ -49,14 +52,20 @@ class Checkpoint(Sprite):
             self.image = pg.transform.rotate(self.base_image, round(self.angle))
             self.rect = self.image.get_rect(center=self.rect.center)
 
+    def move_to(self, pos):
+        self.x, self.y = pos
+        center = self.base_image.get_rect(topleft=pos).center # rotated image is bigger, so center it on the unrotated image
+        self.rect = self.image.get_rect(center=center)
+
 class Portal(AnimatedSprite):
     ''' can teleport player to a level 
     self.state is the portal's color'''
     def __init__(self, level, pos, color): 
         _frames = 1
         _animation_speed = 0
-        super().__init__(level, 'portal', {color: [0, _frames, _animation_speed]}, (54,64), pos, color)
+        super().__init__(level, 'portal', {color: [0, _frames, _animation_speed]}, (54,64), pos, color, shared_states=(color,))
         self.set_obj_attributes()
+        level.hold_sound('level_change')
 
     def interact(self, interacting_obj):
         if type(interacting_obj) == Player: 
@@ -70,7 +79,7 @@ class Orb(AnimatedSprite):
         ''' self.state coresponds to the color of the orb. 'white' is the default color '''
         _frames = 4
         _animation_speed = 5
-        super().__init__(level, 'orb', {color: [0, _frames, _animation_speed]}, (32,32), pos, color)
+        super().__init__(level, 'orb', {color: [0, _frames, _animation_speed]}, (32,32), pos, color, shared_states=(color,))
         self.set_obj_attributes()
 
     def interact(self, interacting_obj):
@@ -83,13 +92,22 @@ class Orb(AnimatedSprite):
         self.level.inactive.remove(self)
         self.level.interactive_objs.add(self)
 
+    def save_state(self):
+        if self.level.inactive.has(self): return 'collected'
+
+    def restore_state(self, state):
+        if state == 'collected':
+            self.level.interactive_objs.remove(self)
+            self.level.inactive.add(self)
+
 class Key(AnimatedSprite):
     ''' collectable key '''
     def __init__(self, level, pos, color):
         _frames = 4
         _animation_speed = 3
-        super().__init__(level, 'key', {color: [0, _frames, _animation_speed]}, (40,24), pos, color)
+        super().__init__(level, 'key', {color: [0, _frames, _animation_speed]}, (40,24), pos, color, shared_states=(color,))
         self.set_obj_attributes()
+        level.hold_sound('key')
         self.spawn_pos = pos
         self.speed = MAX_PLAYER_SPEED/2
         self.follow_radii = (TILE_SIZE*2//3, TILE_SIZE*3//2)  # [min_dis, max_dis]
@@ -99,8 +117,9 @@ class Key(AnimatedSprite):
         super().update(dt) # update animation
 
         if self.follow_obj != None:
-            dx, dy = np.array(self.follow_obj.rect.center) - np.array(self.rect.center)
-            dis = np.linalg.norm((dx,dy))
+            dx = self.follow_obj.rect.centerx - self.rect.centerx
+            dy = self.follow_obj.rect.centery - self.rect.centery
+            dis = hypot(dx, dy)
             if dis <= self.follow_radii[0]: return
             elif dis > self.follow_radii[1] +self.speed*dt: 
                 dx, dy = scale_vector(dx, dy, dis -self.follow_radii[1])
@@ -118,6 +137,10 @@ class Key(AnimatedSprite):
             self.follow_obj = interacting_obj
             interacting_obj.keys.append(self)
 
+    def move_to(self, pos):
+        self.spawn_pos = pos
+        if self.follow_obj == None: self.set_pos(pos) # don't move keys that the player is carrying
+
     def reset(self):
         self.follow_obj = None
         self.rect.center = self.spawn_pos
@@ -129,6 +152,7 @@ class Door(Sprite):
     def __init__(self, level, pos, color):
         super().__init__(level, 'door', pos, color)
         self.set_obj_attributes(solid=True)
+        level.hold_sound('unlock')
     
     def interact(self, player):
         ''' unlock door if player has key of same color '''
@@ -153,8 +177,9 @@ class Bouncer(AnimatedSprite):
             color+'-bounce': [0, 3, 10],
             color+'-attack': [1, 3, 10],
             }
-        super().__init__(level, 'bouncer', _animation_data, (32,32), pos, color)
+        super().__init__(level, 'bouncer', _animation_data, (32,32), pos, color, shared_states=(color,)) # bounce and attack animations are per bouncer
         self.set_obj_attributes(creature=True)
+        level.hold_sound('jump')
         self.action = False # if True, bouncer is bouncing or attacking
         self.bounce_vel = BOUNCE_VEL
 
@@ -175,6 +200,9 @@ class Bouncer(AnimatedSprite):
         self.set_animation_state(self.color)
         self.image = self.animations[self.state][1][int(self.frame)]
 
+    def catch_up(self, dt):
+        if self.action: self.end_animation() # bounce or attack finished while asleep
+
     def bounce(self, target):
         self.set_animation_state(self.color+'-bounce')
         
@@ -182,9 +210,8 @@ class Bouncer(AnimatedSprite):
         target.in_air = True
         self.level.game.play_sound('jump')
         
-        pressed = pg.key.get_pressed()
         target.y_vel = -self.bounce_vel 
-        if pressed[K_JUMP]: target.y_vel -= self.bounce_vel//3
+        if 'jump' in target.inputs.held: target.y_vel -= self.bounce_vel//3
         
         # create particles
         for i in range(-1, 2):
@@ -1,9 +1,10 @@
 import pygame as pg
-import numpy as np
 import random
 from script.settings import *
 from script.sprites import AnimatedSprite, Particle
-from script.utilities import replace_pixels, rotate_vector, scale_vector
+from script.controls import NO_INPUT
+from script.utilities import rotate_vector, scale_vector, sign
+from script.collision import touched, touches_pixels, get_area, substeps
 
 class Player(AnimatedSprite):
     def __init__(self, level, color, shape='circle'):
@@ -11,7 +12,10 @@ class Player(AnimatedSprite):
             'circle': [0, 1, 0],
             'star': [1, 5, 5]
             }
-        super().__init__(level, 'player', _animation_data, PLAYER_SIZE, (0,0), state=shape+'-'+color, color=color)
+        with level.game.images.track() as used: # keep player images cached
+            super().__init__(level, 'player', _animation_data, PLAYER_SIZE, (0,0), state=shape+'-'+color, color=color)
+        for key in used: level.game.images.acquire(key)
+        for key in ('jump', 'death', 'spawn', 'level_change'): level.game.sounds.acquire(key) # keep player sounds cached. decoded when first played
         self.shape = shape
         
         # horizontal movement
@@ -26,44 +30,45 @@ class Player(AnimatedSprite):
         self.dead = False # whether player is dead
         self.pause = 0 # timer that counts down to zero. used for death animation, respawning, etc.
         self.keys = [] # keys collected by player
+        self.inputs = NO_INPUT # InputSnapshot for the current frame. set in update
 
     def get_colored_animations(self, spritesheet_name, animation_data, color):
         ''' get individual images for each frame of all the animations for this object
-        in every color (color argument is unused )
+        in the given color. other colors are only loaded once the player changes to them (see set_color)
         save in a dict (self.animations) mapping animation states (str) to a list.
         format of list for each animation state [animation_speed, [frame1, frame2, ...]] '''
-        self.animations = {} # format: {'state': [animation_speed, [img1, img2, ...]]}
-
-        # get animation for each color
-        for i, color in enumerate(COLORS.keys()):
-            
-            # load spritesheet of the correct color
-            if color == 'white': colored_spritesheet = self.level.game.load_image(spritesheet_name)
-            else: 
-                colored_name = spritesheet_name+'-'+color
-                try: # load colored spritesheet if it has already been loaded
-                    colored_spritesheet = self.level.game.load_image(colored_name) 
-                except: # create colored spritesheet if it has not been loaded
-                    colored_spritesheet = self.level.game.load_image(spritesheet_name)
-                    colored_spritesheet = replace_pixels(colored_spritesheet, COLORS[color], COLORS['white'])
-                    self.level.game.images[colored_name] = colored_spritesheet
-
-            # get animation for each state in each color
-            for state, data in animation_data.items():
-                row, frames, animation_speed = data
-                self.animations[state+'-'+color] = [animation_speed, []]
-
-                # get images for animation frames
-                for frame in range(frames):
-                    frame_name = spritesheet_name+f'-{state}-{i*len(animation_data) +row}-{frame}' # naming convention for animation frame images in Game.images
-                    try: self.animations[state+'-'+color][1].append(self.level.game.images[frame_name])
-                    except: 
-                        self.level.game.images[frame_name] = colored_spritesheet.subsurface( \
-                            (frame*(self.w+SPRITESHEET_SPACING), row*(self.h+SPRITESHEET_SPACING), self.w, self.h))
-                        self.animations[state+'-'+color][1].append(self.level.game.images[frame_name])
-
-    def update(self, dt):
-        ''' for player controls in platforming room (Room_Platform) '''
+        if not hasattr(self, 'animations'): 
+            self.animations = {} # format: {'state': [animation_speed, [img1, img2, ...]]}
+            self.spritesheet_name, self.animation_data = spritesheet_name, animation_data # for loading other colors later
+        i = list(COLORS.keys()).index(color)
+
+        # load spritesheet of the correct color
+        colored_spritesheet = self.level.game.load_colored_image(spritesheet_name, color)
+
+        # get animation for each state
+        for state, data in animation_data.items():
+            row, frames, animation_speed = data
+            self.animations[state+'-'+color] = [animation_speed, []]
+
+            # get images for animation frames
+            for frame in range(frames):
+                frame_name = spritesheet_name+f'-{state}-{i*len(animation_data) +row}-{frame}' # naming convention for animation frame images in Game.images
+                try: self.animations[state+'-'+color][1].append(self.level.game.images[frame_name])
+                except: 
+                    self.level.game.images[frame_name] = colored_spritesheet.subsurface( \
+                        (frame*(self.w+SPRITESHEET_SPACING), row*(self.h+SPRITESHEET_SPACING), self.w, self.h))
+                    self.animations[state+'-'+color][1].append(self.level.game.images[frame_name])
+
+    def load_color(self, color):
+        ''' load animations for a color and keep their images cached '''
+        with self.level.game.images.track() as used:
+            self.get_colored_animations(self.spritesheet_name, self.animation_data, color)
+        for key in used: self.level.game.images.acquire(key)
+
+    def update(self, dt, inputs):
+        ''' for player controls in platforming room (Room_Platform) 
+        inputs: InputSnapshot for this frame (see controls.py) '''
+        self.inputs = inputs
         if self.dead: 
             self.kill()
             return # don't update if dead
@@ -72,29 +77,29 @@ class Player(AnimatedSprite):
             return # don't update while respawning
 
         super().update(dt) # updates animation
-        pressed = pg.key.get_pressed()
 
         # shift level
-        if self.shape == 'star' and self.color != self.level.name and pressed[K_LVL_CHANGE]:
+        if self.shape == 'star' and self.color != self.level.name and 'lvl_change' in inputs.held:
             self.level.game.load_level(self.color) # change level to current color
             self.level.game.play_sound('level_change')
 
         # update velocity
-        self.apply_x_acceleration(pressed) 
-        self.apply_y_acceleration(pressed)
+        self.apply_x_acceleration(inputs) 
+        self.apply_y_acceleration(inputs)
 
         # apply movement and interact with objects
+        start = (self.x, self.y)
         self.solid_collision_check(dt, self.x_vel, self.y_vel) # check for collisions with solid objects
-        self.interactive_collision_check() # interact with interactive objects 
+        self.interactive_collision_check(start) # interact with interactive objects passed through this frame
 
-    def apply_x_acceleration(self, keys_pressed):
-        dir = keys_pressed[K_RIGHT] - keys_pressed[K_LEFT] # direction of movement. 1 = right, -1 = left, 0 = none
+    def apply_x_acceleration(self, inputs):
+        dir = ('right' in inputs.held) - ('left' in inputs.held) # direction of movement. 1 = right, -1 = left, 0 = none
         
         if not dir: # if not moving, apply friction
-            self.x_vel = np.sign(self.x_vel) * max(abs(self.x_vel) - self.level.x_friction, 0) 
+            self.x_vel = sign(self.x_vel) * max(abs(self.x_vel) - self.level.x_friction, 0) 
             return
         
-        if dir == np.sign(self.x_vel):
+        if dir == sign(self.x_vel):
             # see settings.py for description of acceleration curve
             # acceleration is inversely proportional to speed
             curr_acc = PLAYER_SPEED *(1 - (abs(self.x_vel)-PLAYER_SPEED_OFFSET)/MAX_PLAYER_SPEED)**PLAYER_SPEED_EXPONENT
@@ -103,13 +108,16 @@ class Player(AnimatedSprite):
 
         self.x_vel = max(-MAX_PLAYER_SPEED, min(MAX_PLAYER_SPEED, self.x_vel + dir*curr_acc))
 
-    def apply_y_acceleration(self, keys_pressed):
+    def apply_y_acceleration(self, inputs):
         self.apply_gravity()
-        self.jump(keys_pressed)
+        self.jump(inputs)
         
-    def jump(self, keys_pressed, jump_vel=PLAYER_JUMP_VEL):
-        # initiate jump
-        if not self.in_air and keys_pressed[K_JUMP]:
+    def jump(self, inputs, jump_vel=PLAYER_JUMP_VEL):
+        # initiate jump. buffered presses let the player jump if they pressed jump just before landing
+        started = False
+        if not self.in_air and ('jump' in inputs.held or 'jump' in inputs.pressed):
+            started = True
+            self.level.game.controls.consume('jump')
             self.in_air = True
             self.jump_timer = PLAYER_JUMP_TIME
             self.level.game.play_sound('jump')
@@ -118,8 +126,8 @@ class Player(AnimatedSprite):
             for i in range(random.randint(-1,0), random.randint(0,1)+1):
                 Particle(self.level, (self.rect.centerx -4*i, self.rect.bottom), self.color, vel=(100*i -self.x_vel/2, -random.randint(250,300)))
         
-        # use jump timer to set y-velocity
-        if self.jump_timer > 0 and keys_pressed[K_JUMP]:
+        # use jump timer to set y-velocity. a jump always gets lift on its first frame, even if the key was already released (buffered press)
+        if self.jump_timer > 0 and ('jump' in inputs.held or started):
             # jump velocity inversely proportional to time spent jumping
             self.y_vel = jump_vel/PLAYER_JUMP_TIME**10 *(PLAYER_JUMP_TIME-self.jump_timer)**PLAYER_JUMP_EXPONENT -jump_vel
             
@@ -130,50 +138,38 @@ class Player(AnimatedSprite):
 
     def solid_collision_check(self, dt, dx, dy):
         ''' same as Sprite.solid_collision_check, but also accounts for jumping '''
-        # check for horizontal collisions
-        if dx:
-            self.move(dt, dx, 0)
-            collided = pg.sprite.spritecollide(self, self.level.solid_objs, 0) 
-            for sprite in collided:
-                if self.level.interactive_objs.has(sprite): sprite.interact(self)
-
-                # collision to the right
-                if self.rect.right > sprite.rect.left and self.rect.right < sprite.rect.right:
-                    self.rect.right = sprite.rect.left
-                    self.x = self.rect.left
-                    self.x_vel = 0 # cancel built momentum when hitting wall
-                # collision to the left
-                elif self.rect.left < sprite.rect.right and self.rect.left > sprite.rect.left:
-                    self.rect.left = sprite.rect.right
-                    self.x = self.rect.left
+        on_ground = False
+        steps = substeps(dx*dt, dy*dt)
+        for _ in range(steps):
+            # check for horizontal collisions
+            if dx:
+                contact = self.sweep_move(dx*dt/steps, 0)
+                if contact:
+                    for sprite in contact[1]:
+                        if self.level.is_interactive(sprite): sprite.interact(self)
+                    dx = 0
                     self.x_vel = 0 # cancel built momentum when hitting wall
 
-        # check for vertical collisions
-        if dy:
-            self.move(dt, 0, dy)
-            collided = pg.sprite.spritecollide(self, self.level.solid_objs, 0) 
-            if collided:
-                for sprite in collided:
-                    # collision with ceiling
-                    if self.rect.top < sprite.rect.bottom and self.rect.top > sprite.rect.top:
-                        self.rect.top = sprite.rect.bottom
-                        self.y = self.rect.top
-                        self.y_vel = 0
-                        self.jump_timer = 0 # reset jump timer when hitting ceiling
-
-                    # collision with floor
-                    elif self.rect.bottom > sprite.rect.top and self.rect.bottom < sprite.rect.bottom:
-                        self.rect.bottom = sprite.rect.top
-                        self.y = self.rect.top
-                        self.y_vel = 0
-                        self.in_air = False # on ground
-                        self.jump_timer = 0 # reset jump timer when on ground
-            else: self.in_air = True
-
-    def interactive_collision_check(self):
-        ''' checks for collisions with deadly and interactable objects '''
-        collided = pg.sprite.spritecollide(self, self.level.interactive_objs, 0) 
-        for sprite in collided: 
+            # check for vertical collisions
+            if dy:
+                contact = self.sweep_move(0, dy*dt/steps)
+                if contact:
+                    normal, hits = contact
+                    dy = 0
+                    self.y_vel = 0
+                    self.jump_timer = 0 # reset jump timer when hitting ceiling or landing
+                    if normal[1] < 0: on_ground = True # landed on top of an object
+
+        if dy or on_ground: self.in_air = not on_ground # falling or on ground
+
+    def interactive_collision_check(self, start=None):
+        ''' checks for collisions with deadly and interactable objects.
+        start: position at the start of the frame. objects touched anywhere between it and the current position count,
+        so the player can't pass through spikes in one frame (see collision.py) '''
+        x, y = start or (self.x, self.y)
+        box, dx, dy = (x, y, self.w, self.h), self.x -x, self.y -y
+        for sprite in touched(box, dx, dy, self.level.get_interactive(get_area(box, dx, dy))): 
+            if HAZARD_MASKS and sprite.deadly and not touches_pixels(box, dx, dy, self.image, sprite): continue # only touched transparent pixels
             sprite.interact(self)
             if sprite.deadly: break # so death sound only plays once
 
@@ -256,7 +252,12 @@ class Player(AnimatedSprite):
         self.color = color
         name = self.state.split('-') # [shape, color] OR [shape, state, color]
         name = name[0]+'-'+self.color if len(name) == 2 else name[0]+'-'+name[1]+'-'+self.color 
+        if name not in self.animations: self.load_color(self.color) # first time in this color
         self.set_animation_state(name, self.frame)
 
-    def draw(self, surf, offset):
-        if not self.dead and not self.respawning: super().draw(surf, offset, [])
\ No newline at end of file
+    def is_visible(self, views, screen_rect):
+        ''' player is drawn whenever they're on screen, unless dead or respawning (views are ignored) '''
+        return not self.dead and not self.respawning and super().is_visible([], screen_rect)
+
+    def draw(self, surf, offset, views=[]):
+        if self.is_visible(views, surf.get_rect(topleft=offset)): surf.blit(self.image, (self.rect.x -offset[0], self.rect.y -offset[1]))
\ No newline at end of file
@@ -0,0 +1,135 @@
+import pygame as pg
+from collections import namedtuple, deque
+from math import floor, ceil
+from queue import Queue, Empty
+from threading import Thread
+from weakref import WeakKeyDictionary
+from script.settings import *
+
+# immutable description of a frame, built by the main thread and drawn by the RenderThread
+# fills: tuple of (color, pg.Rect or None for the whole surface)
+# blits: tuple of (image, position on game_surface)
+RenderList = namedtuple('RenderList', ['fills', 'blits'])
+
+class DirtyRenderer():
+    ''' finds the parts of the screen that changed since the last frame (dirty rects).
+    when the camera is still, only objects that moved, animated, appeared, or disappeared are redrawn
+    and only those parts of the screen are updated. 
+    scrolling, changing views, or changing levels redraws the whole screen '''
+    def __init__(self):
+        self.prev_level = None
+        self.prev_offset = None
+        self.prev_views = None
+        self.prev_blits = {} # maps sprites to (image, position) from the last frame
+
+    def get_dirty_rects(self, level, camera_offset, views, blits):
+        ''' returns a list of pg.Rects (on game_surface) to redraw, or None if the whole screen needs to be redrawn '''
+        blits_by_sprite = {sprite: (image, pos) for sprite, image, pos in blits}
+        full_redraw = level is not self.prev_level or camera_offset != self.prev_offset or views != self.prev_views
+        prev_blits = self.prev_blits
+        self.prev_level, self.prev_offset, self.prev_views, self.prev_blits = level, camera_offset, views, blits_by_sprite
+        if full_redraw: return None
+
+        dirty_rects = []
+        for sprite, (image, pos) in blits_by_sprite.items():
+            prev = prev_blits.pop(sprite, None)
+            if prev and prev[0] is image and prev[1] == pos: continue # unchanged
+            dirty_rects.append(pg.Rect(pos, image.get_size()))
+            if prev: dirty_rects.append(pg.Rect(prev[1], prev[0].get_size())) # erase old position
+        for image, pos in prev_blits.values(): dirty_rects.append(pg.Rect(pos, image.get_size())) # sprites that disappeared
+
+        # clip to screen, with a pixel of padding for smoothscale blending with neighboring pixels
+        screen_rect = pg.Rect((0,0), RES)
+        dirty_rects = [rect.inflate(2, 2).clip(screen_rect) for rect in dirty_rects]
+        dirty_rects = [rect for rect in dirty_rects if rect.w and rect.h]
+        if sum(rect.w*rect.h for rect in dirty_rects) > screen_rect.w*screen_rect.h//2: return None # cheaper to redraw everything
+        return dirty_rects
+
+    def present(self, screen, game_surface, dirty_rects):
+        ''' scale dirty rects of game_surface to the display and update only those parts of the display '''
+        scale_x, scale_y = screen.get_width()/RES[0], screen.get_height()/RES[1]
+        screen_rects = []
+        for rect in dirty_rects:
+            left, top = floor(rect.left*scale_x), floor(rect.top*scale_y)
+            screen_rect = pg.Rect(left, top, ceil(rect.right*scale_x) -left, ceil(rect.bottom*scale_y) -top).clip(screen.get_rect())
+            if not screen_rect.w or not screen_rect.h: continue
+            pg.transform.smoothscale(game_surface.subsurface(rect), screen_rect.size, screen.subsurface(screen_rect))
+            screen_rects.append(screen_rect)
+        pg.display.update(screen_rects)
+
+
+class RenderThread():
+    ''' draws frames on a separate thread so the next frame can be simulated while the last one is drawn.
+    pygame releases the GIL while blitting and scaling, so the two overlap on multi-core machines.
+    the thread draws RenderLists to its own double-buffered game surfaces and scales them to display size. 
+    the main thread only copies finished frames to the display (display calls must stay on the main thread).
+    the thread never touches surfaces that the main thread uses: images are copied the first time they're drawn (see snapshot).
+    errors on the thread are raised on the main thread, and the main thread never waits longer than RENDER_TIMEOUT '''
+    def __init__(self, screen_size, capture=None):
+        self.capture = capture # FrameCapture that finished game surfaces are copied to while it's recording
+        self.surfaces = [pg.Surface(RES) for _ in range(2)] # game surfaces
+        self.scaled = [pg.Surface(screen_size) for _ in range(2)] # game surfaces scaled to display size
+        self.copies = WeakKeyDictionary() # maps images to copies that only the render thread uses. forgotten when the image is no longer used
+        self.free = Queue() # indices of buffers that can be drawn to
+        for i in range(2): self.free.put(i)
+        self.jobs = Queue() # (buffer index, RenderList) waiting to be drawn
+        self.finished = Queue() # indices of buffers that are ready to be shown, or the exception that stopped the thread
+        self.pending = 0 # frames submitted but not shown yet
+        self.input_times = deque() # when the input of each submitted frame was sampled, oldest first
+
+        Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            i, render_list = self.jobs.get()
+            try:
+                surf = self.surfaces[i]
+                for color, rect in render_list.fills: surf.fill(color, rect)
+                surf.blits(render_list.blits, 0)
+                if self.capture and self.capture.recording: self.capture.capture(surf)
+                pg.transform.smoothscale(surf, self.scaled[i].get_size(), self.scaled[i])
+            except Exception as error:
+                self.finished.put(error) # raised on the main thread by wait
+                return
+            self.finished.put(i)
+
+    def snapshot(self, blits):
+        ''' returns blits with each image replaced by the render thread's copy of it.
+        blitting an image locks it (and the spritesheet it's part of), so the two threads must not share images.
+        images are assumed not to change after they're drawn (changed images are new surfaces, e.g. rotated checkpoints) '''
+        copies = self.copies
+        snapshot = []
+        for image, pos in blits:
+            copy = copies.get(image)
+            if copy == None: copy = copies[image] = image.copy()
+            snapshot.append((copy, pos))
+        return tuple(snapshot)
+
+    def wait(self, queue):
+        ''' get the next buffer index from a queue. raises the render thread's exception if it stopped '''
+        try: result = queue.get(timeout=RENDER_TIMEOUT)
+        except Empty: raise RuntimeError(f'render thread didn\'t finish a frame in {RENDER_TIMEOUT} seconds')
+        if isinstance(result, Exception): raise RuntimeError('render thread stopped') from result
+        return result
+
+    def show(self, screen):
+        ''' wait for the oldest submitted frame and copy it to the display. returns when that frame's input was sampled '''
+        i = self.wait(self.finished)
+        screen.blit(self.scaled[i], (0,0))
+        pg.display.update()
+        self.free.put(i)
+        self.pending -= 1
+        return self.input_times.popleft()
+
+    def draw(self, screen, render_list, input_time):
+        ''' show the previous frame once it's finished, then start drawing this one. called on the main thread.
+        input_time: when this frame's input was sampled. returns the input time of the frame that was shown, or None if none was '''
+        shown = self.show(screen) if self.pending else None
+        self.jobs.put((self.wait(self.free), render_list._replace(blits=self.snapshot(render_list.blits))))
+        self.input_times.append(input_time)
+        self.pending += 1
+        return shown
+
+    def flush(self, screen):
+        ''' show the last frame without starting a new one '''
+        while self.pending: self.show(screen)
@@ -0,0 +1,138 @@
+import pygame as pg
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class ResourceCache():
+    ''' cache for one type of resource (images, sounds, or levels) with a memory budget.
+    used like a dict. each entry has a size in bytes and a reference count.
+    when the cache is over budget, unreferenced and unpinned entries are evicted (least recently used first).
+    args:
+        name: for the memory report
+        budget: max size of the cache (in bytes)
+        get_size: function that returns the size of a resource (in bytes)
+        is_busy: optional function. resources it returns True for are not evicted (e.g. sounds that are playing)
+        on_evict: optional function called with (key, resource) when a resource is evicted
+        get_parent: optional function that returns the resource another one depends on, or None (e.g. the spritesheet of a frame).
+            a cached parent is referenced by its children, so it's only evicted after all of them are '''
+    def __init__(self, name, budget, get_size, is_busy=None, on_evict=None, get_parent=None):
+        self.name = name
+        self.budget = budget
+        self.get_size = get_size
+        self.is_busy = is_busy
+        self.on_evict = on_evict
+        self.get_parent = get_parent
+
+        self.entries = OrderedDict() # maps keys to resources. least recently used first
+        self.sizes = {} # maps keys to size in bytes
+        self.refs = {} # maps keys to reference counts
+        self.pinned = set() # keys that are never evicted
+        self.parents = {} # maps keys to the keys of their parents (see get_parent)
+        self.keys_by_id = {} # maps ids of resources to their keys. for finding parents
+        self.size = 0 # total size in bytes
+        self.tracking = [] # sets of keys used while tracking (see track)
+
+        # stats for memory report
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def __getitem__(self, key):
+        try: resource = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        self.entries.move_to_end(key)
+        for used in self.tracking: used.add(key)
+        return resource
+
+    def __setitem__(self, key, resource):
+        if key in self.entries: 
+            self.size -= self.sizes[key]
+            self.keys_by_id.pop(id(self.entries[key]), None)
+            if key in self.parents: self.unref(self.parents.pop(key))
+        self.entries[key] = resource
+        self.entries.move_to_end(key)
+        self.sizes[key] = self.get_size(resource)
+        self.size += self.sizes[key]
+        self.keys_by_id[id(resource)] = key
+        if self.get_parent:
+            parent = self.keys_by_id.get(id(self.get_parent(resource)))
+            if parent != None:
+                self.parents[key] = parent
+                self.acquire(parent)
+        for used in self.tracking: used.add(key)
+        self.evict()
+
+    def __contains__(self, key): return key in self.entries
+    def __len__(self): return len(self.entries)
+    def keys(self): return self.entries.keys()
+    def values(self): return self.entries.values()
+    def items(self): return self.entries.items()
+
+    def acquire(self, key):
+        ''' add a reference to a resource. referenced resources are not evicted '''
+        self.refs[key] = self.refs.get(key, 0) +1
+
+    def release(self, key):
+        ''' remove a reference added by acquire '''
+        self.unref(key)
+        self.evict()
+
+    def unref(self, key):
+        self.refs[key] -= 1
+        if not self.refs[key]: del self.refs[key]
+
+    def pin(self, key): self.pinned.add(key)
+    def unpin(self, key):
+        self.pinned.discard(key)
+        self.evict()
+
+    def resize(self, key):
+        ''' recalculate the size of a resource that changed (e.g. a level that streamed in new objects) '''
+        if key not in self.entries: return
+        self.size -= self.sizes[key]
+        self.sizes[key] = self.get_size(self.entries[key])
+        self.size += self.sizes[key]
+
+    @contextmanager
+    def track(self):
+        ''' yields a set of the keys that are used (read or added) inside the with block '''
+        used = set()
+        self.tracking.append(used)
+        try: yield used
+        finally: self.tracking.remove(used)
+
+    def evict(self):
+        ''' remove least recently used resources until the cache is under budget.
+        evicting the last child of a parent lets the parent be evicted in the same pass '''
+        while self.size > self.budget:
+            for key in list(self.entries.keys())[:-1]: # never evict the most recently used resource
+                if key in self.refs or key in self.pinned: continue
+                if self.is_busy and self.is_busy(self.entries[key]): continue
+                self.remove(key)
+                break
+            else: return # everything left is in use
+
+    def remove(self, key):
+        resource = self.entries.pop(key)
+        self.size -= self.sizes.pop(key)
+        self.keys_by_id.pop(id(resource), None)
+        if key in self.parents: self.unref(self.parents.pop(key))
+        self.evictions += 1
+        if self.on_evict: self.on_evict(key, resource)
+
+    def report(self):
+        ''' returns a one line summary of the cache '''
+        return (f'{self.name}: {len(self.entries)} entries, {self.size/2**20:.1f}/{self.budget/2**20:.1f} MB, '
+                f'{len(self.refs)} referenced, {len(self.pinned)} pinned, '
+                f'{self.hits} hits, {self.misses} misses, {self.evictions} evictions')
+
+
+def surface_size(surface):
+    ''' size of a pygame.Surface's pixels in bytes. subsurfaces share their parent's pixels, so they're 0 (their parent is counted instead, see get_parent) '''
+    if surface.get_parent() != None: return 0
+    return surface.get_width()*surface.get_height()*surface.get_bytesize()
+
+def sound_size(sound):
+    ''' size of a decoded pygame.mixer.Sound in bytes '''
+    frequency, bits, channels = pg.mixer.get_init()
+    return int(sound.get_length()*frequency*channels*abs(bits)//8)
@@ -0,0 +1,51 @@
+import pygame as pg
+from script.settings import *
+
+class UpdateScheduler():
+    ''' decides which of a level's objects get updated each frame.
+    only objects with behavior are registered (see Sprite.has_behavior), so platforms, spikes, etc. are never updated.
+    objects outside the current views and the area around the screen are put to sleep.
+    when they wake up, they catch up on the time they were asleep in one step (see Sprite.catch_up).
+    which objects are asleep is only checked when the camera moves far enough or the views change,
+    so the cost of each frame depends on the number of awake objects, not the size of the level '''
+    def __init__(self, level):
+        self.level = level
+        self.sprites = set() # registered objects
+        self.awake = [] # registered objects that are updated every frame
+        self.asleep = {} # maps sleeping objects to the time they fell asleep (self.time)
+        self.time = 0 # total time updated (in seconds)
+
+        self.checked_offset = None # camera offset at last sleep check
+        self.checked_views = None # views at last sleep check
+        self.changed = True # objects were registered since last sleep check
+
+    def register(self, sprite):
+        if sprite.has_behavior(): 
+            self.sprites.add(sprite)
+            self.changed = True
+
+    def update(self, dt):
+        self.time += dt
+        offset = self.level.game.camera_offset
+        views = self.level.get_view(self.level.game.player)
+        if self.changed or views != self.checked_views or \
+            abs(offset[0] -self.checked_offset[0]) > SLEEP_CHECK_DISTANCE or abs(offset[1] -self.checked_offset[1]) > SLEEP_CHECK_DISTANCE: 
+            self.check_sleep(offset, views)
+
+        for sprite in self.awake: 
+            if sprite.alive() and not self.level.inactive.has(sprite): sprite.update(dt)
+
+    def check_sleep(self, offset, views):
+        ''' wake up objects near the screen or in current views, put the rest to sleep '''
+        self.checked_offset, self.checked_views, self.changed = offset, views, False
+        area = pg.Rect(offset, RES).inflate(UPDATE_MARGIN*2, UPDATE_MARGIN*2)
+        
+        self.awake = []
+        for sprite in list(self.sprites):
+            if not sprite.alive(): # destroyed or unloaded
+                self.sprites.discard(sprite)
+                self.asleep.pop(sprite, None)
+            elif sprite.rect.colliderect(area) or sprite.rect.collidelist(views) != -1:
+                if sprite in self.asleep: sprite.catch_up(self.time -self.asleep.pop(sprite))
+                self.awake.append(sprite)
+            elif sprite not in self.asleep: self.asleep[sprite] = self.time
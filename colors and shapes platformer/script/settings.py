@@ -3,10 +3,27 @@ import pygame as pg
 
 ### GENERAL ###
 DEBUG = True
+PROFILE_STARTUP = DEBUG # print a breakdown of startup time once the first frame is drawn
+HOT_RELOAD = DEBUG # reload levels when their tmx files are edited
+HOT_RELOAD_INTERVAL = .5 # time between checking level files for changes (in seconds)
+HOT_RELOAD_BUDGET = .002 # max time per frame spent reading edited level files (in seconds)
+TMX_CHUNK = 2**13 # bytes of a tmx file parsed at a time
 SOUND = True
 FULLSCREEN = False
 START_LEVEL = 'white'
 FPS = 60 # frames per second
+TELEMETRY = True # record frame times (see telemetry.py). saved when the game is closed
+TELEMETRY_FRAMES = FPS*60*10 # number of recent frames to keep
+WARMUP = True # preload assets used in previous sessions during idle time at the end of frames (see warmup.py)
+WARMUP_FILE = 'warmup.json' # assets in the order they were first used last session. saved when the game is closed
+WARMUP_BUDGET = .004 # max time spent preloading assets each frame (in seconds)
+DIRTY_RECTS = False # only redraw changed parts of the screen while the camera is still (ignored when DEBUG is on)
+PIPELINED_RENDERING = False # draw each frame on a separate thread while the next one is simulated. adds a frame of latency. debug overlay and DIRTY_RECTS are not used
+RENDER_TIMEOUT = 5 # max time to wait for the render thread to finish a frame (in seconds)
+VSYNC = True # wait for the display's refresh. adds latency on top of the FPS cap
+CAPTURE = False # capture frames from the start (see capture.py). toggle with K_CAPTURE
+CAPTURE_FORMAT = 'png' # 'png' (numbered images) or 'raw' (one file of RGB frames)
+CAPTURE_BUFFERS = 8 # frames waiting to be written to disk. more frames are dropped (each buffer uses about 6 MB)
 
 # (in pixels)
 RES = (1600, 900) # gets scaled to display size
@@ -16,12 +33,41 @@ SPRITESHEET_SPACING = 4 # DO NOT CHANGE. spacing between frames in spritesheet
 SPAWN_POS = (544, 384)
 
 
+### LEVEL STREAMING ###
+# big levels are split into square chunks. only chunks near the camera or the player's current views are loaded
+STREAM_LEVELS = True
+STREAM_MIN_OBJECTS = 1000 # levels with fewer objects than this are loaded all at once
+CHUNK_SIZE = TILE_SIZE*16 # (in pixels)
+CHUNK_MARGIN = CHUNK_SIZE # chunks this close to the screen or current views are loaded ahead of time (in pixels)
+CHUNK_LOAD_BUDGET = .002 # max time spent loading chunks ahead of time each frame (in seconds)
+PINNED_TYPES = ('Checkpoint',) # object types that are never unloaded
+
+
+### UPDATES ###
+# objects outside of the current views and this far from the screen stop updating until they're close again (see scheduler.py)
+UPDATE_MARGIN = TILE_SIZE*8 # (in pixels)
+SLEEP_CHECK_DISTANCE = UPDATE_MARGIN//2 # how far the camera moves before checking which objects are asleep (in pixels)
+
+
+### MEMORY ###
+# budgets for cached resources (in bytes). least recently used resources that aren't in use are evicted when over budget
+IMAGE_BUDGET = 128*2**20
+SOUND_BUDGET = 32*2**20
+LEVEL_BUDGET = 16*2**20
+LEVEL_OBJECT_BYTES = 1024 # rough memory overhead of each object in a level
+STATIC_ARRAYS = True # store platforms and spikes in compact arrays instead of as sprites (see static.py)
+
+
 ### KEY BINDINGS ###
 K_JUMP = pg.K_SPACE
 K_LEFT = pg.K_a
 K_RIGHT = pg.K_d
 K_LVL_CHANGE = pg.K_LSHIFT
 K_RESET = pg.K_r
+K_SAVE_TELEMETRY = pg.K_F8
+K_MEMORY_REPORT = pg.K_F7 # print memory used by images, sounds, and levels
+K_CAPTURE = pg.K_F9 # start or stop capturing frames
+INPUT_BUFFER = FPS//10 # frames that a key press is remembered for (e.g. jump pressed just before landing)
 
 
 ### PHYSICS ###
@@ -49,6 +95,12 @@ BOUNCE_VEL = PLAYER_JUMP_VEL*2
 GRAVITY = abs(30) # downward acceleration (in px/square frame). applied every frame.
 X_FRICTION = abs(PLAYER_SPEED) # friction (in px/square frame). applied to player's x-velocity when not accelerating.
 
+## Collision
+# moves are swept so nothing passes through thin objects (see collision.py)
+COLLISION_SUBSTEP = TILE_SIZE//2 # moves longer than this (in pixels) are split into steps so moving on one axis at a time follows the diagonal path. 0 to turn off
+HAZARD_MASKS = True # deadly objects (e.g. spikes) only hit the player where both of their images are opaque, not their whole rects
+MASK_STEP = 4 # distance between pixel checks along a move (in pixels)
+
 
 ### GRAPHICS ###
 # sizes (in pixels)
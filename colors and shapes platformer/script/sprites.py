@@ -1,7 +1,6 @@
 import pygame as pg
-import numpy as np
 from script.settings import *
-from script.utilities import replace_pixels
+from script.collision import cast, resolve, get_area, substeps
 
 class Sprite(pg.sprite.Sprite):
     def __init__(self, level, image_name, pos, color='white', rgb_shift=0):
@@ -20,22 +19,7 @@ class Sprite(pg.sprite.Sprite):
         ''' get image and set color.
         white is the default sprite color.
         rgb_shift: value by which to change RGB values in image (for lighter or darker colors) ''' 
-        # default color
-        if color == 'white': 
-            self.image = self.level.game.load_image(image_name)
-            return
-        
-        try: # load colored image 
-            self.image = self.level.game.load_image(image_name+'-'+color)    
-        except: # create colored image if it doesn't exist yet
-            self.image = self.level.game.load_image(image_name)
-
-            # get RGB tuple from color string
-            if color == 'orange': rgb_shift = int(rgb_shift*ORANGE_SHIFT_COEF)
-            if rgb_shift: color = (min(255, max(0, rgb+rgb_shift)) for rgb in COLORS[color]) # shift color brighter or darker
-            else: color = COLORS[color]
-            
-            self.image = replace_pixels(self.image, color, C_WHITE)
+        self.image = self.level.game.load_colored_image(image_name, color, rgb_shift)
 
     def set_obj_attributes(self, solid=False, interactable=True, deadly=False, creature=False):
         self.deadly = deadly # used by Player.interactive_collision_check
@@ -48,6 +32,10 @@ class Sprite(pg.sprite.Sprite):
         self.x, self.y = pos
         self.rect.topleft = (round(self.x), round(self.y))
 
+    def move_to(self, pos):
+        ''' moves an object to a new position in the level (e.g. after the level file was edited) '''
+        self.set_pos(pos)
+
     def move(self, dt, dx, dy):
         self.x += dx*dt
         self.y += dy*dt
@@ -57,53 +45,78 @@ class Sprite(pg.sprite.Sprite):
         ''' modifies y_vel. does NOT move sprite '''
         self.y_vel += self.level.gravity
 
+    def sweep_move(self, dx, dy):
+        ''' move by (dx, dy) pixels, stopping when touching the first solid object in the way (see collision.py).
+        returns (contact normal, list of solid objects hit), or None if nothing was hit.
+        if the object starts inside solid objects (e.g. a door was created on top of it), it's pushed out of them first '''
+        box = (self.x, self.y, self.w, self.h)
+        solids = [sprite for sprite in self.level.get_solids(get_area(box, dx, dy)) if sprite is not self]
+        pushed = resolve(box, solids)
+        if pushed != box:
+            self.set_pos(pushed[:2])
+            box = pushed
+            solids = [sprite for sprite in self.level.get_solids(get_area(box, dx, dy)) if sprite is not self]
+        time, normal, hits = cast(box, dx, dy, solids)
+        if normal == None:
+            self.move(1, dx, dy)
+            return None
+
+        # move until touching the object that was hit
+        rect = hits[0].rect
+        if normal[0]: self.x = rect.left -self.w if normal[0] < 0 else rect.right
+        else: self.x += dx*time
+        if normal[1]: self.y = rect.top -self.h if normal[1] < 0 else rect.bottom
+        else: self.y += dy*time
+        self.rect.topleft = (round(self.x), round(self.y))
+        return normal, hits
+
     def solid_collision_check(self, dt, dx, dy):
-        # check for horizontal collisions
-        if dx:
-            self.move(dt, dx, 0)
-            collided = pg.sprite.spritecollide(self, self.level.solid_objs, 0) 
-            for sprite in collided:
-                # collision to the right
-                if self.rect.right > sprite.rect.left and self.rect.right < sprite.rect.right:
-                    self.rect.right = sprite.rect.left
-                    self.x = self.rect.left
-                # collision to the left
-                elif self.rect.left < sprite.rect.right and self.rect.left > sprite.rect.left:
-                    self.rect.left = sprite.rect.right
-                    self.x = self.rect.left
-
-        # check for vertical collisions
-        if dy:
-            self.move(dt, 0, dy)
-            collided = pg.sprite.spritecollide(self, self.level.solid_objs, 0) 
-            for sprite in collided:
-                # collision with ceiling
-                if self.rect.top < sprite.rect.bottom and self.rect.top > sprite.rect.top:
-                    self.rect.top = sprite.rect.bottom
-                    self.y = self.rect.top
-                    self.y_vel = 0
-                # collision with floor
-                elif self.rect.bottom > sprite.rect.top and self.rect.bottom < sprite.rect.bottom:
-                    self.rect.bottom = sprite.rect.top
-                    self.y = self.rect.top
-                    self.y_vel = 0
+        ''' move by velocity (dx, dy) and stop at solid objects. 
+        moves one axis at a time. long moves are split into substeps (see COLLISION_SUBSTEP) '''
+        steps = substeps(dx*dt, dy*dt)
+        for _ in range(steps):
+            # horizontal collisions
+            if dx and self.sweep_move(dx*dt/steps, 0): dx = 0 # stopped by a wall
+
+            # vertical collisions (floor or ceiling)
+            if dy and self.sweep_move(0, dy*dt/steps): 
+                dy = 0
+                self.y_vel = 0
+
+    def has_behavior(self):
+        ''' whether update does anything. objects without behavior are never updated (see scheduler.py) '''
+        return type(self).update is not pg.sprite.Sprite.update
+
+    def catch_up(self, dt):
+        ''' update once for all the time the object was asleep (see scheduler.py) '''
+        self.update(dt)
+
+    def save_state(self):
+        ''' returns state to keep while the object's chunk is unloaded (see chunks.py). None if nothing to keep '''
+        return None
+
+    def restore_state(self, state):
+        ''' restores state returned by save_state when the object's chunk is loaded again '''
+        pass
 
     def interact(self, interacting_obj):
         if self.deadly and self.color != interacting_obj.color: interacting_obj.kill()
 
+    def is_visible(self, views, screen_rect):
+        ''' whether the object should be drawn.
+        views: list of pg.Rects of current views. screen_rect: pg.Rect of the screen in level coordinates '''
+        if views: return self.rect.collidelist(views) != -1 # only draw object if in current view
+        return self.rect.colliderect(screen_rect) # not in room, draw object if it collides with the screen
+
     def draw(self, surf, offset, views):
-        if views: 
-            for view in views: # only draw object if in current view
-                if self.rect.colliderect(view):
-                    surf.blit(self.image, (self.rect.x -offset[0], self.rect.y -offset[1]))
-                    return
-        
-        elif self.rect.colliderect(surf.get_rect(topleft=offset)): # not in room, draw object if it collides with the screen
+        if self.is_visible(views, surf.get_rect(topleft=offset)):
             surf.blit(self.image, (self.rect.x -offset[0], self.rect.y -offset[1]))
 
 
 class AnimatedSprite(Sprite):
-    def __init__(self, level, spritesheet_name, animation_data, size, pos, state=None, color=None, rgb_shift=0):
+    def __init__(self, level, spritesheet_name, animation_data, size, pos, state=None, color=None, rgb_shift=0, shared_states=()):
+        ''' shared_states: animation states that play in lockstep for every sprite with the same spritesheet and color.
+        they use an AnimationClock from Game.animations instead of updating their own frame (see animation.py) '''
         pg.sprite.Sprite.__init__(self)
         self.level = level
         if color != None: self.color = color
@@ -115,10 +128,13 @@ class AnimatedSprite(Sprite):
         else: self.get_colored_animations(spritesheet_name, animation_data, self.color)
 
         # current frame in animation to draw. a negative animation speed means the animation starts at the last frame
-        print(self.animations)
-        if np.sign(self.animations[self.state][0]) == -1: self.frame = len(self.animations[self.state][1]) -.01
+        if self.animations[self.state][0] < 0: self.frame = len(self.animations[self.state][1]) -.01
         else: self.frame = 0 
 
+        # shared animations
+        self.clocks = {state: level.game.animations.get_clock((spritesheet_name, state, self.color), *self.animations[state]) for state in shared_states}
+        self.clock = self.clocks.get(self.state) # None when playing an animation of its own
+
         self.image = self.animations[self.state][1][int(self.frame)] 
         self.rect = self.image.get_rect(topleft=pos) 
         self.x, self.y = pos # update using delta time for more accurate position 
@@ -129,19 +145,8 @@ class AnimatedSprite(Sprite):
         save in a dict (self.animations) mapping animation states (str) to a list.
         format of list for each animation state [animation_speed, [frame1, frame2, ...]] '''
         # load spritesheet
-        try: 
-            spritesheet = self.level.game.load_image(spritesheet_name+'-'+color)    
-        except:
-            spritesheet = self.level.game.load_image(spritesheet_name)
-            spritesheet_name += '-'+color
-
-            # # change color if needed TODO: rgb shifting
-            # if rgb_shift: rgb = (min(max(0, rgb +rgb_shift), 255) for rgb in COLORS[color]) # shift color brighter or darker
-            # else: rgb = COLORS[color]
-            # if color != 'white': spritesheet = replace_pixels(spritesheet, rgb, COLORS['white'])
-
-            # change color if needed
-            if color != 'white': spritesheet = replace_pixels(spritesheet, COLORS[color], COLORS['white'])
+        spritesheet = self.level.game.load_colored_image(spritesheet_name, color) # TODO: rgb shifting
+        spritesheet_name += '-'+color
 
         # get animation frames 
         self.animations = {} # format: {'state': [animation_speed, [img1, img2, ...]]}
@@ -166,7 +171,17 @@ class AnimatedSprite(Sprite):
     def update(self, dt):
         self.animate(dt)
 
+    @property
+    def image(self):
+        if self.clock: return self.clock.image # shared animation
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image = image
+
     def animate(self, dt):
+        if self.clock: return # shared animations are advanced by Game.animations
         animation_speed = self.animations[self.state][0]
         frames = len(self.animations[self.state][1])
         self.frame += animation_speed*dt # animation_speed * delta_time
@@ -174,8 +189,20 @@ class AnimatedSprite(Sprite):
         elif self.frame < 0: self.frame = frames -.001 # loop animation for negative animation_speed
         self.image = self.animations[self.state][1][int(self.frame)]
 
+    def has_behavior(self):
+        if type(self).update is not AnimatedSprite.update: return True
+        return any(speed and len(frames) > 1 for state, (speed, frames) in self.animations.items() if state not in self.clocks) # has an animation of its own that plays
+
+    def catch_up(self, dt):
+        ''' advance animation by all the time the object was asleep in one step (see scheduler.py) '''
+        if self.clock: return
+        animation_speed, frames = self.animations[self.state]
+        self.frame = (self.frame +animation_speed*dt) % len(frames)
+        self.image = frames[int(self.frame)]
+
     def set_animation_state(self, state, frame=0):
         self.state = state
+        self.clock = self.clocks.get(state)
         self.frame = frame
         self.animate(0)
 
@@ -0,0 +1,165 @@
+import pygame as pg
+from array import array
+from random import random
+from script.settings import *
+
+TYPES = ('Platform', 'Spike') # object types stored in StaticObjects. index is the type id
+SOLID = 0 # type id of platforms. spikes are interactive and deadly
+COLOR_NAMES = list(COLORS.keys()) # index is the color id
+FLIP_X, FLIP_Y = 1, 2 # bit flags for flipped images
+
+class StaticObjects():
+    ''' compact storage for a level's objects that never move on their own or update (platforms and spikes).
+    instead of a Sprite for each object, each attribute is a column in an array.
+    StaticObject views give them the parts of the Sprite API that collision, interaction, and drawing use.
+    objects are found by area with a grid of CHUNK_SIZE cells '''
+    def __init__(self, level):
+        self.level = level
+        self.x, self.y, self.w, self.h = (array('i') for _ in range(4)) # rects
+        self.types = array('B') # index into TYPES
+        self.colors = array('B') # index into COLOR_NAMES
+        self.flips = array('B') # FLIP_X and FLIP_Y flags
+        self.alive = array('B') # 0 once killed
+        self.ids = array('i') # Tiled object ids
+
+        self.index = {} # maps Tiled object ids to indices in the arrays
+        self.free = [] # indices of removed objects that can be reused
+        self.grid = {} # maps (column, row) to lists of indices of objects that overlap that cell
+        self.images = {} # maps (type id, color id, flip, size) to images shared by objects that look the same
+
+    def __len__(self): return len(self.index)
+
+    def add(self, record):
+        ''' store an object from a TiledObject record. returns its StaticObject view '''
+        type_id = TYPES.index(record.type)
+        if type_id == SOLID:
+            color = COLOR_NAMES.index(self.level.name) # platforms are the color of the level
+            flip, size = 0, (int(record.width), int(record.height))
+        else:
+            color = COLOR_NAMES.index(record.name or 'white')
+            flip = (random() < .5)*FLIP_X | (random() < .5)*FLIP_Y # randomize image direction
+            size = None # size of the image
+        image = self.get_image(type_id, color, flip, size)
+        rect = image.get_rect(topleft=(record.x, record.y))
+
+        values = (rect.x, rect.y, rect.w, rect.h, type_id, color, flip, 1, record.id)
+        columns = (self.x, self.y, self.w, self.h, self.types, self.colors, self.flips, self.alive, self.ids)
+        if self.free:
+            i = self.free.pop()
+            for column, value in zip(columns, values): column[i] = value
+        else:
+            i = len(self.ids)
+            for column, value in zip(columns, values): column.append(value)
+        self.index[record.id] = i
+        self.add_to_grid(i)
+        return StaticObject(self, i)
+
+    def get_image(self, type_id, color, flip, size):
+        key = (type_id, color, flip, size)
+        if key not in self.images:
+            if type_id == SOLID: image = self.level.game.load_colored_image('platform', COLOR_NAMES[color], FG_RGB_SHIFT)
+            else: image = self.level.game.load_colored_image('spike', COLOR_NAMES[color])
+            if size and size != image.get_size(): image = pg.transform.scale(image, size) # scale image if needed
+            if flip: image = pg.transform.flip(image, flip & FLIP_X, flip & FLIP_Y)
+            self.images[key] = image
+        return self.images[key]
+
+    def get(self, id):
+        ''' returns the StaticObject view of a Tiled object id, or None '''
+        if id in self.index: return StaticObject(self, self.index[id])
+
+    def remove(self, id):
+        ''' destroy an object and free its index '''
+        i = self.index.pop(id)
+        if self.alive[i]: self.kill(i)
+        self.free.append(i)
+
+    def kill(self, i):
+        self.alive[i] = 0
+        for cell in self.get_cells(self.get_rect(i)): self.grid[cell].remove(i)
+
+    def move(self, i, pos):
+        for cell in self.get_cells(self.get_rect(i)): self.grid[cell].remove(i)
+        self.x[i], self.y[i] = int(pos[0]), int(pos[1])
+        self.add_to_grid(i)
+
+    def add_to_grid(self, i):
+        for cell in self.get_cells(self.get_rect(i)): self.grid.setdefault(cell, []).append(i)
+
+    def get_rect(self, i):
+        return pg.Rect(self.x[i], self.y[i], self.w[i], self.h[i])
+
+    def get_cells(self, rect):
+        ''' returns the grid cells that a pg.Rect overlaps '''
+        return [(col, row) for col in range(rect.left//CHUNK_SIZE, (rect.right -1)//CHUNK_SIZE +1)
+                           for row in range(rect.top//CHUNK_SIZE, (rect.bottom -1)//CHUNK_SIZE +1)]
+
+    def query(self, area, solid=None):
+        ''' returns StaticObject views of objects that overlap a pg.Rect.
+        solid: if True only platforms, if False only spikes '''
+        found = set()
+        for cell in self.get_cells(area): found.update(self.grid.get(cell, ()))
+        x, y, w, h, types = self.x, self.y, self.w, self.h, self.types
+        return [StaticObject(self, i) for i in sorted(found)
+                if (solid == None or (types[i] == SOLID) == solid) and area.colliderect((x[i], y[i], w[i], h[i]))]
+
+    def get_size(self):
+        ''' memory used (in bytes). counts images scaled for these objects, but not images shared with Game.images '''
+        cached = {id(image) for image in self.level.game.images.values()}
+        size = sum(column.itemsize*len(column) for column in (self.x, self.y, self.w, self.h, self.types, self.colors, self.flips, self.alive, self.ids))
+        size += 100*len(self.index) +sum(8*len(cell) +56 for cell in self.grid.values()) # rough size of dict entries and grid lists
+        for image in self.images.values():
+            if id(image) not in cached: size += image.get_width()*image.get_height()*image.get_bytesize()
+        return size
+
+
+class StaticObject():
+    ''' view of one object in StaticObjects. works like a Sprite in collision checks, interactions, and drawing.
+    views are made when needed, so two views of the same object are equal but not the same object '''
+    __slots__ = ('objects', 'i')
+    def __init__(self, objects, i):
+        self.objects = objects
+        self.i = i
+
+    def __eq__(self, other): return type(other) == StaticObject and other.objects is self.objects and other.i == self.i
+    def __hash__(self): return hash((id(self.objects), self.i))
+
+    @property
+    def rect(self): return self.objects.get_rect(self.i)
+    @property
+    def image(self):
+        objects, i = self.objects, self.i
+        return objects.get_image(objects.types[i], objects.colors[i], objects.flips[i], (objects.w[i], objects.h[i]) if objects.types[i] == SOLID else None)
+    @property
+    def color(self): return COLOR_NAMES[self.objects.colors[self.i]]
+    @property
+    def state(self): return self.color
+    @property
+    def solid(self): return self.objects.types[self.i] == SOLID
+    @property
+    def deadly(self): return self.objects.types[self.i] != SOLID # spikes
+    @property
+    def tiled_id(self): return self.objects.ids[self.i]
+
+    def alive(self): return bool(self.objects.alive[self.i])
+    def kill(self):
+        if self.alive(): self.objects.kill(self.i)
+    def move_to(self, pos): self.objects.move(self.i, pos)
+
+    def interact(self, interacting_obj):
+        if self.deadly and self.color != interacting_obj.color: interacting_obj.kill()
+
+    def is_visible(self, views, screen_rect):
+        rect = self.rect
+        if views: return rect.collidelist(views) != -1 # only draw object if in current view
+        return rect.colliderect(screen_rect)
+
+    def draw(self, surf, offset, views):
+        if self.is_visible(views, surf.get_rect(topleft=offset)):
+            surf.blit(self.image, (self.objects.x[self.i] -offset[0], self.objects.y[self.i] -offset[1]))
+
+    # never updated (see scheduler.py) and have no state to save (see chunks.py)
+    def has_behavior(self): return False
+    def catch_up(self, dt): pass
+    def save_state(self): return None
+    def restore_state(self, state): pass
@@ -0,0 +1,161 @@
+''' per-frame telemetry.
+Telemetry keeps a ring buffer of frame records while the game runs and saves it to a compact binary file.
+analyze recordings from the command line (from the game's folder):
+    python -m script.telemetry telemetry/<recording>.cst
+    python -m script.telemetry <before>.cst <after>.cst   (compare two recordings) '''
+import json, os, struct, sys
+from array import array
+from time import perf_counter, strftime
+
+# bit flags for things that happened during a frame (likely causes of stalls)
+LEVEL_LOAD = 1 # level created for the first time
+LEVEL_CHANGE = 2 # switched to a previously loaded level
+SOUND_DECODE = 4 # sound played for the first time
+RECOLOR = 8 # colored image created
+IMAGE_DECODE = 16 # image loaded from disk
+LEVEL_RELOAD = 32 # level file edited (see hot_reload.py)
+CAPTURE_DROP = 64 # captured frame dropped because the writer fell behind (see capture.py)
+EVENT_NAMES = {LEVEL_LOAD: 'level load', LEVEL_CHANGE: 'level change', SOUND_DECODE: 'sound decode',
+               RECOLOR: 'recolor', IMAGE_DECODE: 'image decode', LEVEL_RELOAD: 'level reload', CAPTURE_DROP: 'capture drop'}
+
+MAGIC = b'CST1'
+GROUPS = ('solid_objs', 'interactive_objs', 'decorative_objs', 'inactive', 'particles') # sprite counts recorded each frame
+ROW = struct.Struct('<4fB5HB') # time, total, update, draw, level, sprite counts..., events
+
+class Telemetry():
+    ''' ring buffer of per-frame records.
+    arrays are preallocated so recording a frame doesn't allocate any objects '''
+    def __init__(self, size):
+        self.size = size
+        self.count = 0 # frames recorded so far (index of next frame is count % size)
+        self.start = perf_counter()
+        self.prev_time = self.start # end of previous frame
+
+        self.times = [array('f', bytes(4*size)) for _ in range(4)] # time since start, total, update, draw (in seconds)
+        self.levels = array('B', bytes(size)) # index into level_names
+        self.sprites = [array('H', bytes(2*size)) for _ in GROUPS]
+        self.events = array('B', bytes(size))
+        self.level_names = [] # level names in the order they were first active
+        self.pending = 0 # events that happened during the current frame
+
+    def event(self, flag):
+        ''' mark that something happened during the current frame (see bit flags above) '''
+        self.pending |= flag
+
+    def record(self, level, update_time, draw_time):
+        ''' record the current frame. called once per frame after drawing '''
+        now = perf_counter()
+        i = self.count % self.size
+        self.times[0][i] = now -self.start
+        self.times[1][i] = now -self.prev_time
+        self.times[2][i] = update_time
+        self.times[3][i] = draw_time
+        self.prev_time = now
+
+        if level.name not in self.level_names: self.level_names.append(level.name)
+        self.levels[i] = self.level_names.index(level.name)
+        for column, group in zip(self.sprites, GROUPS): column[i] = min(len(getattr(level, group)), 0xffff)
+        self.events[i] = self.pending
+        self.pending = 0
+        self.count += 1
+
+    def save(self, filename=None):
+        ''' write recorded frames (oldest first) to a file. returns the filename '''
+        if filename == None:
+            os.makedirs('telemetry', exist_ok=True)
+            filename = f'telemetry/{strftime("%Y-%m-%d_%H-%M-%S")}.cst'
+
+        n = min(self.count, self.size)
+        first = self.count % self.size if self.count > self.size else 0
+        header = json.dumps({'levels': self.level_names, 'groups': GROUPS}).encode()
+        with open(filename, 'wb') as file:
+            file.write(MAGIC +struct.pack('<II', len(header), n) +header)
+            for j in range(n):
+                i = (first +j) % self.size
+                file.write(ROW.pack(*(column[i] for column in self.times), self.levels[i], *(column[i] for column in self.sprites), self.events[i]))
+        print(f'saved {n} frames of telemetry to {filename}')
+        return filename
+
+
+### ANALYSIS ###
+def load(filename):
+    ''' read a telemetry file. returns (header dict, list of frame tuples in ROW order) '''
+    with open(filename, 'rb') as file: data = file.read()
+    if data[:4] != MAGIC: raise ValueError(f'{filename} is not a telemetry file')
+    header_size, n = struct.unpack_from('<II', data, 4)
+    header = json.loads(data[12:12 +header_size])
+    frames = list(ROW.iter_unpack(data[12 +header_size:12 +header_size +n*ROW.size]))
+    return header, frames
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values: return 0
+    return values[min(len(values) -1, int(len(values)*p/100))]
+
+def summarize(frames):
+    ''' returns a dict of frame time percentiles (in ms) '''
+    summary = {}
+    for column, name in ((1, 'total'), (2, 'update'), (3, 'draw')):
+        values = [frame[column]*1000 for frame in frames]
+        for p in (50, 95, 99): summary[f'{name} p{p}'] = percentile(values, p)
+        summary[f'{name} max'] = max(values, default=0)
+    return summary
+
+def get_stalls(header, frames, threshold):
+    ''' returns a list of (frame index, time, total ms, causes) for frames that took longer than threshold (in ms) '''
+    stalls = []
+    for i, frame in enumerate(frames):
+        if frame[1]*1000 < threshold: continue
+        events = frame[-1] | (frames[i -1][-1] if i else 0) # a slow frame delays the start of the next one
+        causes = [name for flag, name in EVENT_NAMES.items() if events & flag] or ['unknown']
+        stalls.append((i, frame[0], frame[1]*1000, header['levels'][frame[4]], causes))
+    return stalls
+
+def print_histogram(frames, bucket=2, width=50):
+    ''' prints a histogram of total frame times, bucket is in ms '''
+    counts = {}
+    for frame in frames:
+        b = int(frame[1]*1000//bucket)
+        counts[b] = counts.get(b, 0) +1
+    most = max(counts.values(), default=1)
+    for b in range(min(counts, default=0), max(counts, default=0) +1):
+        n = counts.get(b, 0)
+        print(f'{b*bucket:5d}-{(b+1)*bucket:<5d}ms {n:7d} {"#"*round(n/most*width)}')
+
+def report(filename, threshold):
+    header, frames = load(filename)
+    print(f'{filename}: {len(frames)} frames')
+    print_histogram(frames)
+    for name, ms in summarize(frames).items(): print(f'    {name:<12}{ms:8.2f} ms')
+
+    stalls = get_stalls(header, frames, threshold)
+    print(f'{len(stalls)} stalls (frames over {threshold:.1f} ms)')
+    causes = {}
+    for i, time, ms, level, stall_causes in stalls:
+        print(f'    frame {i:6d} at {time:8.2f}s: {ms:7.1f} ms in \'{level}\' ({", ".join(stall_causes)})')
+        for cause in stall_causes: causes[cause] = causes.get(cause, 0) +1
+    for cause, n in causes.items(): print(f'    {cause}: {n} stalls')
+
+def compare(before, after, threshold):
+    header_a, frames_a = load(before)
+    header_b, frames_b = load(after)
+    summary_a, summary_b = summarize(frames_a), summarize(frames_b)
+    print(f'{"":<12}{"before":>10}{"after":>10}{"change":>10}')
+    for name in summary_a:
+        a, b = summary_a[name], summary_b[name]
+        print(f'{name:<12}{a:10.2f}{b:10.2f}{b -a:+10.2f}')
+    a, b = len(get_stalls(header_a, frames_a, threshold)), len(get_stalls(header_b, frames_b, threshold))
+    print(f'{"stalls":<12}{a:10d}{b:10d}{b -a:+10d}')
+
+if __name__ == '__main__':
+    import argparse
+    from script.settings import FPS
+
+    parser = argparse.ArgumentParser(description='analyze telemetry recorded by the game')
+    parser.add_argument('files', nargs='+', help='one recording to analyze, or two recordings to compare')
+    parser.add_argument('--stall', type=float, default=2000/FPS, help='frames slower than this are stalls (in ms). default: 2 frames')
+    args = parser.parse_args()
+
+    if len(args.files) == 1: report(args.files[0], args.stall)
+    elif len(args.files) == 2: compare(args.files[0], args.files[1], args.stall)
+    else: sys.exit('pass one recording to analyze or two to compare')
@@ -1,5 +1,4 @@
-import numpy as np
-from math import sin, cos, pi
+from math import sin, cos, atan, pi, radians
 
 def replace_pixels(img, color, replace=(0,0,0)):
     ''' Swap one color for another in an image, preserve transparency.
@@ -17,21 +16,22 @@ def replace_pixels(img, color, replace=(0,0,0)):
                 img.set_at((x, y), (r, g, b, pixel[3]))
     return img
 
+def sign(x):
+    ''' returns 1 for positive numbers, -1 for negative numbers, and 0 for 0 '''
+    return (x > 0) - (x < 0)
+
 def scale_vector(dx, dy, size):
     ''' takes a change in x and y values (in pixels), 
     scales them to to new size, and return '''
-    try: angle = np.arctan(dy/dx) # in radians
+    try: angle = atan(dy/dx) # in radians
     except: 
         if dy == 1: angle = pi/2
         elif dy == -1: angle = pi*3/2
         else: angle = 0
-    sign_x = np.sign(dx)
-    sign_y = np.sign(dy)
-    return sign_x*size*abs(cos(angle)), sign_y*size*abs(sin(angle))
+    return sign(dx)*size*abs(cos(angle)), sign(dy)*size*abs(sin(angle))
 
 def rotate_vector(vec, theta):
     ''' takes a vector and rotates it by theta degrees clockwise. '''
-    vec = np.array(vec)
-    theta = np.deg2rad(theta)
-    rot = np.array(((cos(theta), -sin(theta)), (sin(theta), cos(theta))))
-    return np.dot(rot, vec)
\ No newline at end of file
+    x, y = vec
+    theta = radians(theta)
+    return cos(theta)*x - sin(theta)*y, sin(theta)*x + cos(theta)*y
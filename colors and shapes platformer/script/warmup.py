@@ -0,0 +1,159 @@
+''' preloads assets that previous sessions used, so using them for the first time doesn't stall the game.
+while the game runs, the first use of each sound, image, recolored image, and level is recorded in order (the trace).
+on exit the trace is saved as a manifest (WARMUP_FILE). on the next startup, the manifest's assets are loaded
+in the order they were first needed, using the idle time at the end of frames (up to WARMUP_BUDGET per frame).
+assets that take longer than WARMUP_BUDGET to load are skipped. levels are warmed up over several frames:
+their files are read a piece at a time (see TmxReader), then their objects are created.
+warmed levels are only kept if they fit in LEVEL_BUDGET without evicting other levels '''
+import json, os
+import pygame as pg
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+from script.settings import *
+
+class Warmup():
+    def __init__(self, game):
+        self.game = game
+        self.recording = False # whether first uses are traced. off during startup and while warming up
+        self.start = perf_counter()
+
+        self.seen = set() # (kind, *args) of assets used this session
+        self.trace = [] # [kind, args, time of first use (in seconds), load time (in ms)] of assets in the order they were first used
+        self.queue = deque() # manifest entries waiting to be loaded
+        self.manifest = [] # entries loaded from WARMUP_FILE
+        self.warmed = set() # (kind, *args) of assets loaded ahead of time
+        self.reader = None # TmxReader reading the file of the level being warmed up
+        self.building = None # Level whose objects are being created over several frames. added to Game.levels once finished
+
+        # for report
+        self.stalls = 0 # assets loaded on first use
+        self.avoided = 0 # assets that were already loaded ahead of time on first use
+        self.skipped = 0 # manifest assets that weren't loaded ahead of time because they're too slow to load or don't fit in memory
+
+    def load_manifest(self, filename=None):
+        filename = filename or WARMUP_FILE
+        if not os.path.exists(filename): return
+        with open(filename) as file: self.manifest = json.load(file)['assets']
+        self.queue = deque(self.manifest)
+
+    def start_recording(self):
+        ''' called once the game has started. assets loaded before this are part of startup '''
+        self.start = perf_counter()
+        self.recording = True
+
+    def touch(self, kind, *args):
+        ''' record the use of an asset that was already loaded '''
+        if not self.recording: return
+        key = (kind, *args)
+        if key in self.seen: return
+        self.seen.add(key)
+        self.trace.append([kind, list(args), perf_counter() -self.start, 0])
+        if key in self.warmed: self.avoided += 1
+
+    @contextmanager
+    def load(self, kind, *args):
+        ''' with block around loading an asset that wasn't loaded yet. records the time it took '''
+        start = perf_counter()
+        yield
+        key = (kind, *args)
+        if not self.recording or key in self.seen: return # loaded while warming up, or loaded again after being evicted
+        self.seen.add(key)
+        self.trace.append([kind, list(args), start -self.start, (perf_counter() -start)*1000])
+        self.stalls += 1
+
+    def update(self, idle):
+        ''' load queued assets. idle: time left until the next frame (in seconds).
+        assets that don't fit in the time left are postponed to the next frame. one level is warmed up at a time (see build) '''
+        if not (self.queue or self.reader or self.building) or idle <= 0: return
+        budget = min(idle, WARMUP_BUDGET)
+        start = perf_counter()
+        loaded = 0
+        self.recording = False
+        if self.reader or self.building: 
+            self.build(budget)
+            loaded += 1
+        while self.queue and not (self.reader or self.building):
+            kind, args, time, cost = self.queue[0]
+            if kind == 'level':
+                if loaded: break # started in the next frame
+            elif cost/1000 > WARMUP_BUDGET: # would stall a frame on its own. loaded on first use instead
+                self.queue.popleft()
+                self.skipped += 1
+                continue
+            elif perf_counter() -start +cost/1000 > budget: break # doesn't fit in this frame
+            self.queue.popleft()
+            if self.warm(kind, args):
+                if kind != 'level': self.warmed.add((kind, *args)) # levels are added once they're built
+                loaded += 1
+        self.recording = True
+
+    def warm(self, kind, args):
+        ''' load an asset if it isn't loaded yet. returns whether it was loaded (for levels, whether building started) '''
+        game = self.game
+        if kind == 'sound':
+            if not SOUND or args[0] in game.sounds: return False
+            game.sounds[args[0]] = pg.mixer.Sound(f'sound/{args[0]}.mp3')
+        elif kind == 'level':
+            if args[0] in game.levels or not os.path.exists(f'level/{args[0]}.tmx'): return False
+            if game.levels.size >= game.levels.budget: # no room without evicting levels that were played
+                self.skipped += 1
+                return False
+            from script.level import TmxReader
+            self.reader = TmxReader(args[0]) # read in the next frames (see build)
+        elif kind in ('image', 'recolor'):
+            misses = game.images.misses # images are only loaded on a cache miss
+            if kind == 'image': game.load_image(*args)
+            else: game.load_colored_image(*args)
+            return game.images.misses > misses
+        return True
+
+    def build(self, budget):
+        ''' warm up a level for up to budget seconds: read its file a piece at a time, then create its objects.
+        finished levels are added to Game.levels if they fit in its budget without evicting other levels '''
+        game = self.game
+        if self.reader:
+            reader = self.reader
+            if reader.name in game.levels: # the game needed it before it was read
+                self.reader = None
+                return
+            if not reader.read(budget): return
+            from script.level import Level
+            self.reader = None
+            self.building = Level(game, reader.name, build=False, tmx=(reader.records, reader.views)) # objects are created in the next frames
+            return
+
+        level = self.building
+        if level.name in game.levels: # the game needed it before it was finished
+            self.building = None
+            level.release()
+            return
+        active_checkpoint = game.active_checkpoint # creating a level can change the active checkpoint
+        done = level.build(budget)
+        game.active_checkpoint = active_checkpoint
+        if not done: return
+
+        self.building = None
+        if game.levels.size +game.levels.get_size(level) > game.levels.budget:
+            self.skipped += 1
+            level.release()
+            return
+        game.levels[level.name] = level
+        self.warmed.add(('level', level.name))
+
+    def save(self, filename=None):
+        ''' save this session's trace as the manifest for the next session.
+        assets from the previous manifest that weren't used this session are kept at the end '''
+        filename = filename or WARMUP_FILE
+        costs = {(kind, *args): cost for kind, args, time, cost in self.manifest}
+        assets = []
+        for kind, args, time, cost in sorted(self.trace, key=lambda entry: entry[2]): # assets loaded inside another (e.g. a level's images) are recorded first
+            assets.append([kind, args, round(time, 3), round(cost or costs.get((kind, *args), 0), 3)]) # warmed assets keep the load time from the last manifest
+        assets += [entry for entry in self.manifest if (entry[0], *entry[1]) not in self.seen]
+        with open(filename, 'w') as file: # one asset per line
+            file.write('{"assets": [\n' +',\n'.join(json.dumps(asset) for asset in assets) +'\n]}\n')
+
+    def report(self):
+        ''' returns a summary of first uses this session '''
+        return (f'warmup: {len(self.warmed)} of {len(self.manifest)} manifest assets loaded ahead of time, {self.skipped} skipped, {len(self.queue)} still queued\n'
+                f'    {len(self.seen)} assets used: {self.avoided} first uses already loaded (stalls avoided), {self.stalls} loaded on first use (stalls)')